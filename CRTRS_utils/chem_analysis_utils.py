@@ -1,194 +1,746 @@
-"""Utilities related to chem_analysis.dat files. """
-import numpy as np
-from platform import python_version
-
-# print version of packages
-print("Import PyPlt:")
-print("python version: ", python_version())
-print("numpy version: ", np.version.version)
-
-
-class chem_analysis:
-    """Parse chem_analysis.dat and get data.
-
-    # Argument
-        file_path: file (with full path) to be parsed
-
-    # Exampe
-        data = 
-
-    # Return
-
-    # Date
-        20191015
-    """
-
-    def __init__(self, file_path):
-
-        self.filename = file_path
-
-        try:
-            with open(file_path, 'r') as file:
-                # store line with content in a list
-                # use line[:-1] to get rid of \n in each line
-                self.content_list = [line[:-1] for line in file.readlines()
-                                     if line.strip()]
-        except OSError:
-            print('File {} cannot be opened.'.format(file_path))
-            exit()
-
-        # get number of timestamp
-        NumTimeStamp = 0
-        for line in self.content_list:
-            if line.startswith('Time ='):
-                NumTimeStamp = NumTimeStamp + 1
-        self.NumTimeStamp = NumTimeStamp
-
-    def get_time(self, dtype='float32'):
-        """get time stamp of each output.
-
-        format of time stamp in chem_analysis.dat :
-        ..
-        ...
-        ****************************************
-        Time =     7.14286E-08 s
-        ****************************************
-        ..
-
-        # Argument
-            dtype: dtype of numpy array
-               'str', 'float32', 'float64',....
-
-        # Exampe
-            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
-            time = chem.get_time()
-
-        # Return
-            numpy array of time stamp
-
-        # Date
-            20191212
-        """
-
-        time = [line.split()[2] for line in self.content_list
-                if line.startswith('Time =')]
-        time = np.array(time, dtype=dtype)
-
-        assert len(time) == self.NumTimeStamp
-
-        return time
-
-    def get_te(self, dtype='float32'):
-        """get electron temperature (eV) of each output.
-
-        format of electron temperature in chem_analysis.dat :
-        ..
-        ...
-        ****************************************
-
-        Electron Temperature =   6.14 eV
-
-        ****************************************
-        ..
-
-        # Argument
-            dtype: dtype of numpy array
-               'str', 'float32', 'float64',....
-
-        # Exampe
-            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
-            time = chem.get_te()
-
-        # Return
-            numpy array of electron temperature (eV)
-
-        # Date
-            20191212
-        """
-
-        te = [line.split()[3] for line in self.content_list
-              if line.startswith('Electron Temperature = ')]
-        te = np.array(te, dtype=dtype)
-
-        assert len(te) == self.NumTimeStamp
-
-        return te
-
-    def get_species(self, dtype='float32'):
-        """get species and its density(m-3) and fraction(%)
-
-        format of species in chem_analysis.dat :
-
-        ****************************************
-        Species Densities & Concentrations
-        ****************************************
-        Species    Density (m-3)   Density (%)
-        E            3.61137E+14    0.00007484
-        O2^          1.78914E+14    0.00003708
-        ...
-        ********************
-
-        # Argument
-            dtype: dtype of numpy array
-               'str', 'float32', 'float64',....
-
-        # Exampe
-            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
-            den, fra = chem.get_species()
-
-        # Return
-            dictionary of density(m-3) and fraction(%)
-            Ex:
-            den['E'] = array([3.61137E+14,...], dtype = float32)
-            fra['E'] = array([0.00007484,...], dtype = float32)
-
-        # Date
-            20191213
-        """
-        if_find_data = False
-        spe = []  # species
-        den = []  # density
-        fra = []  # fraction
-        den_dict = {}
-        fra_dict = {}
-        for line in self.content_list:
-            # find data block
-            if line.startswith('Species    Density (m-3)   Density (%)'):
-                if_find_data = True
-                continue
-
-            # end of data block, append data from list to dictionary
-            if if_find_data and line.startswith('*****'):
-                # check if dictionary empty, len gives number of keys (species)
-                # if empty(no species), create empty list for each species
-                if len(den_dict) == 0:
-                    for sp in spe:
-                        den_dict[sp] = []
-                        fra_dict[sp] = []
-
-                for ind, sp in enumerate(spe):
-                    den_dict[sp].append(den[ind])
-                    fra_dict[sp].append(fra[ind])
-
-                if_find_data = False
-                spe.clear()
-                den.clear()
-                fra.clear()
-                continue
-
-            # parse data
-            if if_find_data:
-                line = line.split()
-                spe.append(line[0])
-                den.append(line[1])
-                fra.append(line[2])
-                continue
-
-        # convert type
-        for key in den_dict:
-            den_dict[key] = np.array(den_dict[key], dtype=dtype)
-            fra_dict[key] = np.array(fra_dict[key], dtype=dtype)
-            assert len(den_dict[key]) == self.NumTimeStamp
-            assert len(fra_dict[key]) == self.NumTimeStamp
-
-        return den_dict, fra_dict
+"""Utilities related to chem_analysis.dat files. """
+import os
+import re
+import tempfile
+import zipfile
+
+import numpy as np
+from platform import python_version
+
+# print version of packages
+print("Import PyPlt:")
+print("python version: ", python_version())
+print("numpy version: ", np.version.version)
+
+# version of parse(), sidecar files of other versions are parsed again
+PARSER_VERSION = '20261018.4'
+
+# states of parse() for lines of a section:
+#   ****************************************
+#   Species Densities & Concentrations        (header)
+#   ****************************************
+#   Species    Density (m-3)   Density (%)    (body)
+#   ...
+#   ********************
+AFTER_STAR, HEADER, BODY, OTHER = range(4)
+
+# minimum number of timestamps (rows) and species or sections (columns) of
+# buffers, buffers loaded from a sidecar may be empty
+MIN_ROW = 64
+MIN_COL = 8
+# dtype of time and electron temperature as written in the file
+TEXT = 'S32'
+
+
+class chem_analysis:
+    """Parse chem_analysis.dat and get data.
+
+    The file is parsed in one pass line by line, and time, electron
+    temperature and density/fraction of species of each timestamp are kept
+    in numpy arrays (lines of the file are not kept), the text of time and
+    electron temperature as well for get_time('str') and get_te('str').
+    get_time(), get_te() and get_species() return these arrays without
+    parsing the file again.
+
+    Density and fraction are (timestamp, species) matrices, den and fra,
+    with species in the order of the list species (species_index maps
+    species to column), so reductions over species are one numpy call.
+
+    Parsed arrays are saved in a sidecar file next to the source (ex:
+    .chem_analysis.npz for chem_analysis.dat), keyed by size and
+    modification time of the source and PARSER_VERSION, and they are loaded
+    instead of parsing the file next time if the key still matches.  If
+    the file changes while it's parsed (a running simulation appends to
+    it), no sidecar is written; any later append changes size and mtime,
+    so the sidecar is not used and is replaced.
+
+    While a simulation is running, refresh() parses only the records
+    appended since the last parse.  A record (from its 'Time =' line to
+    the next one) is complete when the next record starts; refresh() keeps
+    the last record once its species table is finished, and parses it
+    again in case more of it is written.
+
+    The same pass indexes byte offsets of each record (record) and of each
+    section of a record (section), a section is a header line between two
+    lines of '*' and the lines after it until the next line of '*'.  Any
+    section is read by get_section() (or get_table()) by seeking to its
+    offset, without reading the rest of the file.
+
+    # Argument
+        file_path: file (with full path) to be parsed
+        cache: load and save sidecar file, default = True
+
+    # Exampe
+        chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+        time = chem.get_time()
+        den, fra = chem.get_species()
+        # total density of positive ions at each timestamp
+        species, den, fra = chem.get_species_matrix()
+        ion = [sp.endswith('^') for sp in species]
+        ion_den = den[:, ion].sum(axis=1)
+        # a section of the last timestamp
+        names, columns, rate = chem.get_table('Reaction Rates', -1)
+        # poll a running simulation
+        num_new = chem.refresh()
+
+    # Return
+
+    # Date
+        20261018
+    """
+
+    def __init__(self, file_path, cache=True):
+
+        self.filename = file_path
+        self.sidecar = sidecar_file(file_path)
+        self.reset()
+
+        try:
+            stat = os.stat(file_path)
+            if not (cache and self.load_sidecar(stat)):
+                with open(file_path, 'rb') as file:
+                    self.parse(file)
+                if cache and same_stat(stat, os.stat(file_path)):
+                    self.save_sidecar(stat)
+        except OSError:
+            print('File {} cannot be opened.'.format(file_path))
+            exit()
+        self.stat = stat
+
+    def reset(self):
+        """Clear parsed arrays, the file is parsed from its beginning next.
+        """
+        self.species = []
+        self.species_index = {}
+        self.section_names = []
+        self.section_index = {}
+        # byte offset and number of records before the last record
+        self.offset = 0
+        self.num_complete = 0
+        self.buffer = {'time': np.full(MIN_ROW, np.nan),
+                       'te': np.full(MIN_ROW, np.nan),
+                       'time_text': np.full(MIN_ROW, b'', dtype=TEXT),
+                       'te_text': np.full(MIN_ROW, b'', dtype=TEXT),
+                       'den': np.full((MIN_ROW, MIN_COL), np.nan),
+                       'fra': np.full((MIN_ROW, MIN_COL), np.nan),
+                       'record': np.full((MIN_ROW, 2), -1, dtype=np.int64),
+                       'section': np.full((MIN_ROW, MIN_COL, 2), -1,
+                                          dtype=np.int64)}
+        self.set_size(0)
+
+    def set_size(self, num_time):
+        """Set time, te, den, fra, record and section to the first
+        num_time rows of buffers.
+        """
+        num_species = len(self.species)
+        num_section = len(self.section_names)
+        self.time = self.buffer['time'][:num_time]
+        self.te = self.buffer['te'][:num_time]
+        self.time_text = self.buffer['time_text'][:num_time]
+        self.te_text = self.buffer['te_text'][:num_time]
+        self.den = self.buffer['den'][:num_time, :num_species]
+        self.fra = self.buffer['fra'][:num_time, :num_species]
+        # offsets of records ('Time =' line and end of its last section),
+        # and of sections of each record, -1 if a section is not in it
+        self.record = self.buffer['record'][:num_time]
+        self.section = self.buffer['section'][:num_time, :num_section]
+        # get number of timestamp
+        self.NumTimeStamp = num_time
+
+    def load_sidecar(self, stat):
+        """Load parsed arrays from sidecar file if its key matches.
+
+        # Argument
+            stat: os.stat() of chem_analysis.dat
+
+        # Return
+            True if arrays are loaded, False if there's no valid sidecar
+
+        # Date
+            20261018
+        """
+        try:
+            with np.load(self.sidecar) as data:
+                if (str(data['version']) != PARSER_VERSION or
+                        int(data['size']) != stat.st_size or
+                        int(data['mtime_ns']) != stat.st_mtime_ns):
+                    return False
+                buffer = {name: data[name]
+                          for name in ('time', 'te', 'time_text', 'te_text',
+                                       'den', 'fra', 'record', 'section')}
+                species = [str(sp) for sp in data['species']]
+                section_names = [str(name) for name in data['section_names']]
+                offset = int(data['offset'])
+                num_complete = int(data['num_complete'])
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            return False
+
+        self.buffer = buffer
+        self.species = species
+        self.species_index = {sp: ind for ind, sp in enumerate(species)}
+        self.section_names = section_names
+        self.section_index = {name: ind
+                              for ind, name in enumerate(section_names)}
+        self.offset = offset
+        self.num_complete = num_complete
+        self.set_size(len(buffer['time']))
+        return True
+
+    def save_sidecar(self, stat):
+        """Save parsed arrays to sidecar file, keyed by stat of the source.
+
+        The file is written to a temporary file and renamed, so a reader
+        never loads a partial sidecar; nothing is saved if the directory is
+        not writable.
+
+        # Argument
+            stat: os.stat() of chem_analysis.dat before it was parsed
+
+        # Date
+            20261018
+        """
+        try:
+            fd, tmp = tempfile.mkstemp(suffix='.tmp',
+                                       dir=os.path.dirname(self.sidecar))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                np.savez(fout,
+                         version=PARSER_VERSION,
+                         size=stat.st_size,
+                         mtime_ns=stat.st_mtime_ns,
+                         offset=self.offset,
+                         num_complete=self.num_complete,
+                         time=self.time,
+                         te=self.te,
+                         time_text=self.time_text,
+                         te_text=self.te_text,
+                         species=np.array(self.species, dtype=str),
+                         den=self.den,
+                         fra=self.fra,
+                         record=self.record,
+                         section=self.section,
+                         section_names=np.array(self.section_names,
+                                                dtype=str))
+            os.replace(tmp, self.sidecar)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def refresh(self):
+        """Parse records appended to the file since the last parse.
+
+        Parsing starts from the byte offset of the last record, so only
+        the last record and records after it are read.  A partially
+        written line or species table at the end of the file is ignored
+        until it is finished.  If the file is shorter than before (the
+        simulation is restarted), it is parsed from the beginning.
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            while running:
+                if chem.refresh() > 0:
+                    te = chem.get_te()
+                time.sleep(60)
+
+        # Return
+            number of new timestamps
+
+        # Date
+            20261018
+        """
+        num_old = self.NumTimeStamp
+        try:
+            stat = os.stat(self.filename)
+            if same_stat(stat, self.stat):
+                return 0
+            if stat.st_size < self.offset:
+                self.reset()
+                num_old = 0
+            with open(self.filename, 'rb') as file:
+                file.seek(self.offset)
+                self.parse(file, follow=True)
+        except OSError:
+            print('File {} cannot be opened.'.format(self.filename))
+            exit()
+        self.stat = stat
+
+        return self.NumTimeStamp - num_old
+
+    def parse(self, file, follow=False):
+        """Parse time, electron temperature, species and offsets of records.
+
+        Records are parsed from the current position of file, which is
+        the beginning of the file or self.offset, and rows of buffers from
+        self.num_complete are (re)filled.  Buffers of (timestamp, species)
+        grow by doubling, so they are the only memory taken by the file.
+        Species are in the order they first appear; a species that is not
+        in the table of a timestamp is NaN at that timestamp, so is the
+        electron temperature of a timestamp without it.
+
+        A section is named by its header line, without the value after '='
+        (ex: 'Electron Temperature' for 'Electron Temperature = 6.14 eV'),
+        and its start (header line) and end (line of '*' after its body)
+        offsets are kept in buffer 'section'; a section that is not
+        finished is not indexed.
+
+        # Argument
+            file: file object of chem_analysis.dat opened in binary mode
+            follow: the file is being written (refresh()), the last record
+                is kept only if its species table is finished, default =
+                False, all records are kept
+
+        # Date
+            20261018
+        """
+        buffer = self.buffer
+        time = buffer['time']
+        te = buffer['te']
+        time_text = buffer['time_text']
+        te_text = buffer['te_text']
+        den = buffer['den']
+        fra = buffer['fra']
+        record = buffer['record']
+        section = buffer['section']
+        species = self.species
+        column = self.species_index
+        section_names = self.section_names
+        section_index = self.section_index
+
+        position = self.offset
+        num_time = self.num_complete
+        # timestamps kept before are not held back again
+        num_shown = self.NumTimeStamp
+        row = num_time - 1
+        table_done = False
+        if_find_data = False
+        # self.offset is a 'Time =' line, which is after a line of '*'
+        state = AFTER_STAR if self.offset > 0 else OTHER
+        name = None
+        header_start = 0
+        for line in file:
+            start = position
+            position = position + len(line)
+
+            # end of header or body of a section, a partially written line
+            # of '*' ends it as well
+            if line.startswith(b'*'):
+                if state == HEADER:
+                    state = BODY
+                    continue
+                if state == BODY and row >= 0:
+                    if name is not None:
+                        if name not in section_index:
+                            section_index[name] = len(section_names)
+                            section_names.append(name)
+                            if len(section_names) > section.shape[1]:
+                                num_col = more(section.shape[1],
+                                               MIN_COL)
+                                section = grow(section,
+                                               (section.shape[0], num_col, 2),
+                                               fill=-1)
+                        if section[row, section_index[name], 0] < 0:
+                            section[row, section_index[name]] = \
+                                [header_start, start]
+                    record[row, 1] = start
+                    # end of data block
+                    if if_find_data:
+                        if_find_data = False
+                        table_done = True
+                state = AFTER_STAR
+                continue
+
+            # stop at a partially written line
+            if not line.endswith(b'\n'):
+                break
+
+            # header of a section
+            if state == AFTER_STAR and line.strip():
+                state = HEADER
+                header_start = start
+                name = line.split(b'=')[0].strip().decode()
+            elif state == HEADER and line.strip():
+                state = OTHER
+
+            # parse data
+            if if_find_data:
+                line = line.split()
+                if not line or row < 0:
+                    continue
+                sp = line[0].decode()
+                if sp not in column:
+                    column[sp] = len(species)
+                    species.append(sp)
+                    if len(species) > den.shape[1]:
+                        shape = (den.shape[0], more(den.shape[1], MIN_COL))
+                        den = grow(den, shape)
+                        fra = grow(fra, shape)
+                den[row, column[sp]] = float(line[1])
+                fra[row, column[sp]] = float(line[2])
+                continue
+
+            # find data block
+            if line.startswith(b'Species    Density (m-3)   Density (%)'):
+                if_find_data = state == BODY
+                continue
+
+            # a new record, the previous one is complete
+            if line.startswith(b'Time ='):
+                # the record is not a section of itself
+                name = None
+                self.offset = start
+                self.num_complete = num_time
+                row = num_time
+                num_time = num_time + 1
+                table_done = False
+                if num_time > len(time):
+                    num_row = more(len(time), MIN_ROW)
+                    time = grow(time, (num_row,))
+                    te = grow(te, (num_row,))
+                    time_text = grow(time_text, (num_row,), fill=b'')
+                    te_text = grow(te_text, (num_row,), fill=b'')
+                    den = grow(den, (num_row, den.shape[1]))
+                    fra = grow(fra, (num_row, fra.shape[1]))
+                    record = grow(record, (num_row, 2), fill=-1)
+                    section = grow(section, (num_row,) +
+                                   section.shape[1:], fill=-1)
+                time_text[row] = line.split()[2]
+                time[row] = float(time_text[row])
+                te_text[row] = b''
+                te[row] = np.nan
+                den[row] = np.nan
+                fra[row] = np.nan
+                record[row] = [start, position]
+                section[row] = -1
+                continue
+
+            if line.startswith(b'Electron Temperature = ') and row >= 0:
+                te_text[row] = line.split()[3]
+                te[row] = float(te_text[row])
+
+        # last record of a running simulation is kept once its species
+        # table is finished, unless it was kept before
+        if (follow and num_time > max(self.num_complete, num_shown) and
+                not table_done):
+            num_time = self.num_complete
+
+        self.buffer = {'time': time, 'te': te, 'time_text': time_text,
+                       'te_text': te_text, 'den': den, 'fra': fra,
+                       'record': record, 'section': section}
+        self.set_size(num_time)
+
+    def get_section(self, name, timestamp=-1):
+        """get lines of a section of a timestamp.
+
+        Only the bytes of the section are read from the file, at offsets
+        indexed when it was parsed.
+
+        # Argument
+            name: name of section, one of section_names, ex:
+                'Species Densities & Concentrations', 'Reaction Rates'
+            timestamp: index of timestamp, negative counts from the last one
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            header, lines = chem.get_section(
+                'Species Densities & Concentrations', -1)
+
+        # Return
+            header line and list of non-empty lines of the body, or None if
+            the timestamp has no such section
+
+        # Date
+            20261018
+        """
+        if name not in self.section_index:
+            raise ValueError('section {} is not in {}, sections are '
+                             '{}'.format(name, self.filename,
+                                         self.section_names))
+        timestamp = range(self.NumTimeStamp)[timestamp]
+        start, end = self.section[timestamp, self.section_index[name]]
+        if start < 0:
+            return None
+
+        try:
+            with open(self.filename, 'rb') as file:
+                file.seek(start)
+                lines = file.read(end - start).decode().splitlines()
+        except OSError:
+            print('File {} cannot be opened.'.format(self.filename))
+            exit()
+
+        # body is after the line of '*' that closes the header
+        header = lines[0].strip()
+        body = []
+        if_body = False
+        for line in lines[1:]:
+            if line.startswith('*'):
+                if_body = True
+                continue
+            if if_body and line.strip():
+                body.append(line.rstrip())
+
+        return header, body
+
+    def get_table(self, name, timestamp=-1, dtype='float32'):
+        """get a section that is a table of a timestamp.
+
+        format of a table, columns are separated by 2 or more spaces in the
+        first line and the first column is the name of each row:
+
+        ****************************************
+        Reaction Rates
+        ****************************************
+        Reaction   Rate (m-3/s)
+        R1         1.000E+20
+        ...
+        ********************
+
+        # Argument
+            name: name of section, one of section_names
+            timestamp: index of timestamp, negative counts from the last one
+            dtype: dtype of numpy array
+               'str', 'float32', 'float64',....
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            names, columns, rate = chem.get_table('Reaction Rates', -1)
+
+        # Return
+            list of names of rows, list of names of columns, and numpy
+            array of values (number of rows, number of columns - 1), or
+            None if the timestamp has no such section
+
+        # Date
+            20261018
+        """
+        section = self.get_section(name, timestamp)
+        if section is None:
+            return None
+        header, body = section
+        if not body:
+            raise ValueError('section {} of timestamp {} is not a '
+                             'table'.format(name, timestamp))
+
+        columns = re.split(r'\s{2,}', body[0].strip())
+        rows = [line.split() for line in body[1:]]
+        names = [row[0] for row in rows]
+        values = np.array([row[1:] for row in rows], dtype=dtype)
+        values = values.reshape(len(rows), -1)
+
+        return names, columns, values
+
+    def get_time(self, dtype='float32'):
+        """get time stamp of each output.
+
+        format of time stamp in chem_analysis.dat :
+        ..
+        ...
+        ****************************************
+        Time =     7.14286E-08 s
+        ****************************************
+        ..
+
+        # Argument
+            dtype: dtype of numpy array
+               'str', 'float32', 'float64',....
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            time = chem.get_time()
+
+        # Return
+            numpy array of time stamp, as written in the file if dtype is
+            'str' (ex: '7.14286E-08')
+
+        # Date
+            20191212
+        """
+        if np.dtype(dtype).kind in 'SU':
+            return self.time_text.astype(dtype)
+
+        return self.time.astype(dtype)
+
+    def get_te(self, dtype='float32'):
+        """get electron temperature (eV) of each output.
+
+        format of electron temperature in chem_analysis.dat :
+        ..
+        ...
+        ****************************************
+
+        Electron Temperature =   6.14 eV
+
+        ****************************************
+        ..
+
+        # Argument
+            dtype: dtype of numpy array
+               'str', 'float32', 'float64',....
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            time = chem.get_te()
+
+        # Return
+            numpy array of electron temperature (eV), NaN if a timestamp
+            has no electron temperature; as written in the file if dtype is
+            'str' (ex: '6.14'), '' if a timestamp has no electron temperature
+
+        # Date
+            20191212
+        """
+        if np.dtype(dtype).kind in 'SU':
+            return self.te_text.astype(dtype)
+
+        return self.te.astype(dtype)
+
+    def get_species(self, dtype='float32'):
+        """get species and its density(m-3) and fraction(%)
+
+        format of species in chem_analysis.dat :
+
+        ****************************************
+        Species Densities & Concentrations
+        ****************************************
+        Species    Density (m-3)   Density (%)
+        E            3.61137E+14    0.00007484
+        O2^          1.78914E+14    0.00003708
+        ...
+        ********************
+
+        # Argument
+            dtype: dtype of numpy array
+               'str', 'float32', 'float64',....
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            den, fra = chem.get_species()
+
+        # Return
+            dictionary of density(m-3) and fraction(%), NaN at timestamps
+            where the species is not listed ('' if dtype is 'str')
+            Ex:
+            den['E'] = array([3.61137E+14,...], dtype = float32)
+            fra['E'] = array([0.00007484,...], dtype = float32)
+
+        # Date
+            20191213
+        """
+        species, den, fra = self.get_species_matrix(dtype)
+
+        # columns are views of the matrices, not copies
+        den_dict = {}
+        fra_dict = {}
+        for ind, sp in enumerate(species):
+            den_dict[sp] = den[:, ind]
+            fra_dict[sp] = fra[:, ind]
+
+        return den_dict, fra_dict
+
+    def get_species_matrix(self, dtype='float32'):
+        """get species and matrices of density(m-3) and fraction(%)
+
+        # Argument
+            dtype: dtype of numpy array
+               'str', 'float32', 'float64',....
+
+        # Exampe
+            chem = chem_analysis_utils.chem_analysis(chem_analysis_path)
+            species, den, fra = chem.get_species_matrix()
+            # 3 species of highest density at each timestamp
+            top = np.array(species)[np.argsort(-den, axis=1)[:, :3]]
+
+        # Return
+            list of species, and density(m-3) and fraction(%) in arrays of
+            shape (number of timestamps, number of species), NaN where a
+            species is not listed at a timestamp; the arrays are not
+            copied if dtype is float64, don't modify them.  With dtype
+            'str', values are as written in the file (ex: '3.61137E+14'),
+            read again from species tables, '' where a species is not
+            listed
+
+        # Date
+            20261018
+        """
+        if np.dtype(dtype).kind in 'SU':
+            den, fra = self.species_text()
+            return list(self.species), den.astype(dtype), fra.astype(dtype)
+
+        return (list(self.species),
+                self.den.astype(dtype, copy=False),
+                self.fra.astype(dtype, copy=False))
+
+    def species_text(self):
+        """Density and fraction as written in the file.
+
+        Only floats are kept when the file is parsed, so species tables
+        are read again from the byte range of each record.
+
+        # Return
+            arrays of density and fraction of dtype TEXT, shape (number of
+            timestamps, number of species), b'' where a species is not
+            listed
+
+        # Date
+            20261018
+        """
+        den = np.full(self.den.shape, b'', dtype=TEXT)
+        fra = np.full(self.fra.shape, b'', dtype=TEXT)
+        column = self.species_index
+
+        try:
+            with open(self.filename, 'rb') as file:
+                for row, (start, end) in enumerate(self.record):
+                    file.seek(start)
+                    if_find_data = False
+                    for line in file.read(end - start).splitlines():
+                        if line.startswith(
+                                b'Species    Density (m-3)   Density (%)'):
+                            if_find_data = True
+                            continue
+                        if line.startswith(b'*'):
+                            if_find_data = False
+                            continue
+                        line = line.split()
+                        if if_find_data and line:
+                            sp = line[0].decode()
+                            if sp in column:
+                                den[row, column[sp]] = line[1]
+                                fra[row, column[sp]] = line[2]
+        except OSError:
+            print('File {} cannot be opened.'.format(self.filename))
+            exit()
+
+        return den, fra
+
+
+def sidecar_file(file_path):
+    """Sidecar file of parsed arrays, ex: dir/.chem_analysis.npz for
+    dir/chem_analysis.dat."""
+    dir_name, base_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(dir_name,
+                        '.' + os.path.splitext(base_name)[0] + '.npz')
+
+
+def same_stat(stat, other):
+    """True if size and modification time of two os.stat() are the same."""
+    return (stat.st_size == other.st_size and
+            stat.st_mtime_ns == other.st_mtime_ns)
+
+
+def more(size, minimum):
+    """Size of a buffer grown by doubling, at least minimum."""
+    return max(2*size, minimum)
+
+
+def grow(array, shape, fill=np.nan):
+    """Copy an array into a larger one of shape filled with fill.
+
+    # Date
+        20261018
+    """
+    out = np.full(shape, fill, dtype=array.dtype)
+    out[tuple(slice(0, size) for size in array.shape)] = array
+    return out
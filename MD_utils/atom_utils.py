@@ -0,0 +1,174 @@
+"""Utilities related to tables of atoms."""
+
+import numpy as np
+
+# memory of one atom in AtomTable (atom_id, type_code, x, y, z)
+BYTES_PER_ATOM = 8 + 1 + 3*8
+
+
+class AtomTable:
+    """Struct-of-arrays table of atoms.
+
+    Atoms are stored as numpy columns instead of per-atom python objects:
+        atom_id: int64 id of each atom
+        type_code: uint8 code of species of each atom, species[type_code]
+            gives name of the species
+        pos: float64 array with shape (3, N), pos[0], pos[1], pos[2] are
+            contiguous x, y, z columns
+        species: list of species names (lookup table of type_code)
+
+    Slicing returns views of the columns, masking (or index array) and
+    concatenation return copies.
+
+    # Argument
+        atom_id: id of atoms
+        type_code: code of species of atoms
+        x: x coordinates of atoms
+        y: y
+        z: z
+        species: list of species names, species[type_code] is the name
+
+    # Example
+        table = AtomTable.from_types([1, 2], ['Si', 'O'],
+                                     [0.0, 1.0], [0.0, 1.0], [0.0, 1.0])
+        table = table[table.z > 0.5]
+
+    # Date
+        20261018
+    """
+
+    def __init__(self, atom_id, type_code, x, y, z, species):
+
+        self.atom_id = np.asarray(atom_id, dtype=np.int64)
+        self.type_code = np.asarray(type_code, dtype=np.uint8)
+        self.species = [str(name) for name in species]
+        if len(self.species) > 256:
+            raise ValueError('at most 256 species in AtomTable')
+
+        self.pos = np.empty((3, len(self.atom_id)))
+        self.pos[0] = x
+        self.pos[1] = y
+        self.pos[2] = z
+
+    @classmethod
+    def from_pos(cls, atom_id, type_code, pos, species):
+        """Create a table that uses pos (shape (3, N), float64) without copy.
+        """
+        table = cls.__new__(cls)
+        table.atom_id = np.asarray(atom_id, dtype=np.int64)
+        table.type_code = np.asarray(type_code, dtype=np.uint8)
+        table.species = [str(name) for name in species]
+        table.pos = np.asarray(pos, dtype=np.float64)
+        return table
+
+    @classmethod
+    def from_types(cls, atom_id, atom_type, x, y, z, species=None):
+        """Create a table from species names of each atom.
+
+        # Argument
+            atom_id: id of atoms
+            atom_type: species names of atoms, ex: ['Si', 'O', ...]
+            x: x coordinates of atoms
+            y: y
+            z: z
+            species: list of species names, default is the names in
+                atom_type, in the order they first appear
+
+        # Return
+            AtomTable
+        """
+        atom_type = np.asarray(atom_type, dtype=str)
+        names, first, code = np.unique(atom_type, return_index=True,
+                                       return_inverse=True)
+        if species is None:
+            species = list(names[np.argsort(first)])
+        species = list(species)
+        missing = set(names) - set(species)
+        if missing:
+            raise ValueError('species {} not in {}'.format(sorted(missing),
+                                                           species))
+        remap = np.array([species.index(name) for name in names],
+                         dtype=np.uint8)
+        return cls(atom_id, remap[code.ravel()], x, y, z, species)
+
+    @classmethod
+    def empty(cls, num_atom, species=()):
+        """Create a table with num_atom uninitialized atoms."""
+        return cls.from_pos(np.empty(num_atom, dtype=np.int64),
+                            np.empty(num_atom, dtype=np.uint8),
+                            np.empty((3, num_atom)),
+                            species)
+
+    @staticmethod
+    def concatenate(tables):
+        """Join tables in order, species tables are merged.
+
+        # Argument
+            tables: list of AtomTable
+
+        # Return
+            AtomTable
+        """
+        tables = list(tables)
+        if len(tables) == 0:
+            return AtomTable.empty(0)
+        species = []
+        for table in tables:
+            for name in table.species:
+                if name not in species:
+                    species.append(name)
+        if len(tables) == 1:
+            return tables[0]
+
+        codes = []
+        for table in tables:
+            remap = np.array([species.index(name) for name in table.species],
+                             dtype=np.uint8)
+            codes.append(remap[table.type_code] if len(remap)
+                         else table.type_code)
+        return AtomTable.from_pos(
+            np.concatenate([table.atom_id for table in tables]),
+            np.concatenate(codes),
+            np.concatenate([table.pos for table in tables], axis=1),
+            species)
+
+    def __len__(self):
+        return len(self.atom_id)
+
+    def __getitem__(self, key):
+        """Slice (view), boolean mask or index array (copy) of atoms."""
+        return AtomTable.from_pos(self.atom_id[key],
+                                  self.type_code[key],
+                                  self.pos[:, key],
+                                  self.species)
+
+    def __repr__(self):
+        return 'AtomTable({} atoms, species={})'.format(len(self),
+                                                       self.species)
+
+    @property
+    def x(self):
+        return self.pos[0]
+
+    @property
+    def y(self):
+        return self.pos[1]
+
+    @property
+    def z(self):
+        return self.pos[2]
+
+    @property
+    def coord(self):
+        """(N, 3) view of coordinates."""
+        return self.pos.T
+
+    @property
+    def atom_type(self):
+        """Species names of each atom (numpy array of str)."""
+        return np.array(self.species, dtype=str)[self.type_code]
+
+    def as_tuple(self):
+        """Return (atom_id, atom_type, x, y, z) as returned before AtomTable.
+        """
+        return self.atom_id, self.atom_type, self.x, self.y, self.z
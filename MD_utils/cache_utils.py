@@ -0,0 +1,228 @@
+"""Utilities related to on-disk cache of generated structures."""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+try:
+    from . import atom_utils
+except ImportError:
+    import atom_utils
+
+
+def make_key(*args):
+    """Hash of parameters (numbers, strings and nested lists of them).
+
+    Floats are converted with repr(), so parameters that differ in the
+    last digit get different keys.
+
+    # Example
+        key = make_key('si_001', 5.431, 10, 10, 10, xyz_bound, version)
+
+    # Date
+        20261018
+    """
+    def convert(value):
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return [convert(v) for v in value]
+        if isinstance(value, (float, np.floating)):
+            return repr(float(value))
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return str(value)
+    text = json.dumps(convert(list(args)))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def read_member(fin, path):
+    """Memory map of the next array of a file of arrays written by
+    np.save() one after another.
+
+    # Arguments
+        fin: file object of path, at the start of an array
+        path: file name
+
+    # Return
+        numpy.memmap (or an empty array), fin is moved to the next array
+
+    # Date
+        20261018
+    """
+    version = np.lib.format.read_magic(fin)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(fin)
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(fin)
+    offset = fin.tell()
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=dtype)
+    array = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                      shape=shape, order='F' if fortran else 'C')
+    fin.seek(offset + array.nbytes)
+    return array
+
+
+class LatticeCache:
+    """Cache of AtomTable as .npy files in a directory.
+
+    Only species, type_code and pos are stored, atom ids are consecutive
+    and are given when a table is loaded.  They are stored uncompressed
+    and memory mapped when loaded, so a hit is a copy of the file into the
+    table: for 2M atoms of si_001, building takes ~0.03 s, a hit ~0.015 s
+    and saving ~0.015 s (0.056 s and 0.235 s with compressed .npz), the
+    file is 25 bytes per atom.  Files are written to a temporary
+    file and renamed, so several processes can share a directory.  The
+    modification time of a file is updated when it is loaded, and the
+    least recently used files are removed when the directory is larger
+    than max_bytes.
+
+    # Argument
+        cache_dir: directory of cache files, created if it doesn't exist
+        max_bytes: size cap of the directory (in bytes), default = 1 GB
+
+    # Example
+        cache = LatticeCache('~/.cache/MD_utils')
+        key = make_key(...)
+        table = cache.load(key, id_start=1)
+        if table is None:
+            table = build_lattice(...)
+            cache.save(key, table)
+
+    # Date
+        20261018
+    """
+
+    suffix = '.npy'
+
+    def __init__(self, cache_dir, max_bytes=1024**3):
+
+        self.cache_dir = os.path.realpath(os.path.expanduser(cache_dir))
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # max_bytes may be smaller than the last time
+        self.evict()
+
+    def path(self, key):
+        """File name of a key."""
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def load(self, key, id_start=1, out=None):
+        """Load a table, None if it's not in the cache.
+
+        # Arguments
+            key: key from make_key()
+            id_start: atom id of first atom
+            out: AtomTable with the same number of atoms to be filled in
+                place, default = None to allocate a new table
+
+        # Return
+            AtomTable, or None
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fin:
+                species = [str(name) for name in read_member(fin, path)]
+                type_code = read_member(fin, path)
+                pos = read_member(fin, path)
+            if pos.shape != (3, len(type_code)):
+                raise ValueError('shape of pos is {}'.format(pos.shape))
+        except (OSError, IOError, ValueError, EOFError) as e:
+            # a file truncated by a killed run is built again
+            if not isinstance(e, FileNotFoundError):
+                self.remove(path)
+            self.misses = self.misses + 1
+            return None
+
+        num_atom = len(type_code)
+        if out is None:
+            out = atom_utils.AtomTable.empty(num_atom, species)
+        elif len(out) != num_atom:
+            self.misses = self.misses + 1
+            return None
+        out.species = species
+        out.type_code[:] = type_code
+        out.pos[:] = pos
+        out.atom_id[:] = np.arange(id_start, id_start + num_atom)
+        del type_code, pos
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits = self.hits + 1
+        return out
+
+    def save(self, key, table, evict=True):
+        """Save a table, and remove least recently used files if needed.
+
+        # Arguments
+            key: key from make_key()
+            table: AtomTable
+            evict: check size of cache directory after saving, default =
+                True
+        """
+        # not named *.npy until complete, so it's never evicted or loaded
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                np.save(fout, np.array(table.species, dtype=str))
+                np.save(fout, table.type_code)
+                np.save(fout, table.pos)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if evict:
+            self.evict()
+
+    def remove(self, path):
+        """Remove a cache file, it may be removed by another process."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def files(self):
+        """List of (mtime, size, path) of cache files, oldest first."""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return sorted(files)
+
+    def size(self):
+        """Total size of cache files (in bytes)."""
+        return sum(size for mtime, size, path in self.files())
+
+    def evict(self):
+        """Remove least recently used files until the cache fits max_bytes.
+
+        # Return
+            number of files removed
+        """
+        files = self.files()
+        total = sum(size for mtime, size, path in files)
+        num_removed = 0
+        for mtime, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total = total - size
+            num_removed = num_removed + 1
+        return num_removed
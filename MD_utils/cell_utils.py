@@ -0,0 +1,242 @@
+"""Utilities related to cell lists (uniform grid spatial index)."""
+
+import numpy as np
+
+
+class CellList:
+    """Uniform grid of cells over atoms, built once and queried many times.
+
+    Atoms are sorted by the cell they are in, atoms of cell c are
+    order[start[c]:start[c+1]], so a query only looks at atoms in cells
+    that intersect it instead of all atoms.  Periodic dimensions follow
+    the LAMMPS bounds, default 'pp pp ff' (periodic in x and y).
+
+    # Argument
+        coord: an array with shape (N, 3) of coordinates, ex: AtomTable.coord
+        box: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of simulation box, atoms
+            outside of a non-periodic dimension are put in the first or last
+            cell of that dimension
+        cell_size: minimum size of a cell (in Angstrum), use cutoff of
+            neighbour search, or a few Angstrum for region queries
+        bounds: LAMMPS bounds, 'p' means periodic, default = 'pp pp ff'
+
+    # Example
+        cells = CellList(table.coord, box, 3.0)
+        i, j, d = cells.pairs(2.0)
+        keep = str_utils.delete_mask(table.coord, delete_list, cells=cells)
+
+    # Date
+        20261018
+    """
+
+    def __init__(self, coord, box, cell_size, bounds='pp pp ff'):
+
+        self.coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+        self.box = np.array(box, dtype=float).reshape(3, 2)
+        self.periodic = np.array([b.startswith('p') for b in bounds.split()])
+        self.length = self.box[:, 1] - self.box[:, 0]
+
+        # number of cells in each dimension, cells are at least cell_size
+        self.num_cell = np.maximum(
+            1, np.floor(self.length / cell_size).astype(int))
+        self.cell_size = np.where(self.length > 0,
+                                  self.length / self.num_cell, 1.0)
+
+        # sort atoms by cell
+        cell = self.linear_index(self.cell_index(self.coord))
+        self.order = np.argsort(cell, kind='stable')
+        count = np.bincount(cell, minlength=np.prod(self.num_cell))
+        self.start = np.concatenate([[0], np.cumsum(count)])
+
+    def cell_index(self, coord):
+        """Index of cell (ix, iy, iz) of each point, shape (N, 3)."""
+        index = np.floor((coord - self.box[:, 0]) /
+                         self.cell_size).astype(int)
+        wrapped = np.mod(index, self.num_cell)
+        clipped = np.clip(index, 0, self.num_cell - 1)
+        return np.where(self.periodic, wrapped, clipped)
+
+    def linear_index(self, index):
+        """Linear index of cell (ix, iy, iz), ix changes fastest."""
+        nx, ny, nz = self.num_cell
+        return (index[..., 2]*ny + index[..., 1])*nx + index[..., 0]
+
+    def atoms_in_cells(self, cells):
+        """Indices of atoms in the cells with given linear indices."""
+        cells = np.asarray(cells, dtype=int).ravel()
+        count = self.start[cells + 1] - self.start[cells]
+        total = int(np.sum(count))
+        if total == 0:
+            return np.zeros(0, dtype=int)
+        # position of each atom in order[], cell by cell
+        offset = np.repeat(self.start[cells] - np.cumsum(count) + count,
+                           count)
+        return self.order[offset + np.arange(total)]
+
+    def candidates(self, bound):
+        """Indices of atoms in cells that intersect an axis-aligned box.
+
+        This is a superset of the atoms inside bound, test them with the
+        exact region afterwards.  Bounds are not wrapped across periodic
+        boundaries, the same as the region functions in str_utils.
+
+        # Arguments
+            bound: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi], can be infinite
+
+        # Return
+            array of indices of atoms (sorted)
+        """
+        bound = np.array(bound, dtype=float).reshape(3, 2)
+        if np.any(bound[:, 0] > bound[:, 1]):
+            return np.zeros(0, dtype=int)
+
+        # atoms outside of a non-periodic box are in the first/last cell
+        lo = np.floor((np.maximum(bound[:, 0],
+                                  self.box[:, 0] - self.cell_size) -
+                       self.box[:, 0]) / self.cell_size)
+        hi = np.floor((np.minimum(bound[:, 1],
+                                  self.box[:, 1] + self.cell_size) -
+                       self.box[:, 0]) / self.cell_size)
+        lo = np.clip(lo, 0, self.num_cell - 1).astype(int)
+        hi = np.clip(hi, 0, self.num_cell - 1).astype(int)
+        # periodic dimensions: atoms outside of the box are wrapped into
+        # cells, so include all cells if bound reaches outside of the box
+        for dim in range(3):
+            if self.periodic[dim] and (
+                    bound[dim, 0] < self.box[dim, 0] or
+                    bound[dim, 1] >= self.box[dim, 1]):
+                lo[dim] = 0
+                hi[dim] = self.num_cell[dim] - 1
+
+        ix = np.arange(lo[0], hi[0] + 1)
+        iy = np.arange(lo[1], hi[1] + 1)
+        iz = np.arange(lo[2], hi[2] + 1)
+        index = np.stack(np.meshgrid(ix, iy, iz, indexing='ij'), axis=-1)
+        atoms = self.atoms_in_cells(self.linear_index(index))
+        return np.sort(atoms)
+
+    def region_mask(self, region):
+        """Check which atoms are inside of a region, testing only atoms in
+        cells that intersect the bounding box of the region.
+
+        # Arguments
+            region: a str_utils.Region (ex: str_utils.make_region(...))
+
+        # Return
+            boolean array with shape (N,), True if the atom is inside
+        """
+        mask = np.zeros(len(self.coord), dtype=bool)
+        cand = self.candidates(region.bound)
+        if len(cand) > 0:
+            mask[cand] = region.mask(self.coord[cand])
+        return mask
+
+    def neighbour_offsets(self):
+        """Offsets of neighbour cells in each dimension, without repeats."""
+        offsets = []
+        for dim in range(3):
+            n = self.num_cell[dim]
+            if self.periodic[dim] and n < 3:
+                offsets.append(np.arange(n))
+            else:
+                offsets.append(np.array([-1, 0, 1]))
+        return offsets
+
+    def minimum_image(self, d):
+        """Apply minimum image convention to displacements, shape (N, 3)."""
+        periodic = self.periodic & (self.length > 0)
+        L = np.where(periodic, self.length, 1.0)
+        return d - np.where(periodic, L*np.round(d / L), 0.0)
+
+    def pairs(self, cutoff, other=None):
+        """Find pairs of atoms closer than cutoff.
+
+        Only atoms in the same or adjacent cells are compared, so cutoff
+        needs to be smaller than or equal to cell_size, and smaller than
+        half of the box in periodic dimensions (minimum image).
+
+        # Arguments
+            cutoff: distance cutoff (in Angstrum)
+            other: None to find pairs i < j of atoms in this cell list, or
+                an array with shape (M, 3) of points to find (point, atom)
+                pairs
+
+        # Return
+            i, j, d: arrays of index of first atom (or point), index of
+            second atom and distance of each pair
+        """
+        if np.any(cutoff > self.cell_size[self.num_cell > 1]):
+            raise ValueError('cutoff {} > cell size {}'.format(
+                cutoff, self.cell_size))
+
+        if other is None:
+            points = self.coord
+            p_cell = self.linear_index(self.cell_index(points))
+            p_order = self.order
+            p_start = self.start
+        else:
+            points = np.asarray(other, dtype=float).reshape(-1, 3)
+            p_cell = self.linear_index(self.cell_index(points))
+            p_order = np.argsort(p_cell, kind='stable')
+            p_start = np.concatenate([[0], np.cumsum(np.bincount(
+                p_cell, minlength=np.prod(self.num_cell)))])
+
+        # cells with points, and their (ix, iy, iz)
+        cells_a = np.flatnonzero(np.diff(p_start) > 0)
+        nx, ny, nz = self.num_cell
+        index_a = np.stack([cells_a % nx, (cells_a // nx) % ny,
+                            cells_a // (nx*ny)], axis=-1)
+
+        i_list = []
+        j_list = []
+        d_list = []
+        ox, oy, oz = self.neighbour_offsets()
+        for dx in ox:
+            for dy in oy:
+                for dz in oz:
+                    index_b = index_a + np.array([dx, dy, dz])
+                    valid = np.ones(len(index_b), dtype=bool)
+                    for dim in range(3):
+                        if self.periodic[dim]:
+                            index_b[:, dim] = np.mod(index_b[:, dim],
+                                                     self.num_cell[dim])
+                        else:
+                            valid &= (index_b[:, dim] >= 0) & \
+                                     (index_b[:, dim] < self.num_cell[dim])
+                    a = cells_a[valid]
+                    b = self.linear_index(index_b[valid])
+
+                    # all pairs of points in cell a and atoms in cell b
+                    na = p_start[a + 1] - p_start[a]
+                    nb = self.start[b + 1] - self.start[b]
+                    npair = na * nb
+                    keep = npair > 0
+                    a, b, na, nb, npair = (a[keep], b[keep], na[keep],
+                                           nb[keep], npair[keep])
+                    total = int(np.sum(npair))
+                    if total == 0:
+                        continue
+                    q = np.repeat(np.arange(len(a)), npair)
+                    local = np.arange(total) - np.repeat(
+                        np.cumsum(npair) - npair, npair)
+                    i = p_order[p_start[a[q]] + local // nb[q]]
+                    j = self.order[self.start[b[q]] + local % nb[q]]
+                    if other is None:
+                        keep = i < j
+                        i = i[keep]
+                        j = j[keep]
+                    d = np.sqrt(np.sum(self.minimum_image(
+                        self.coord[j] - points[i])**2, axis=1))
+                    close = d < cutoff
+                    i_list.append(i[close])
+                    j_list.append(j[close])
+                    d_list.append(d[close])
+
+        if not i_list:
+            return (np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                    np.zeros(0))
+        i = np.concatenate(i_list)
+        j = np.concatenate(j_list)
+        d = np.concatenate(d_list)
+        order = np.lexsort((j, i))
+        return i[order], j[order], d[order]
@@ -2,7 +2,9 @@
 
 import argparse
 import os
+import sys
 import datetime
+import multiprocessing
 import numpy as np
 
 # import my modules
@@ -12,12 +14,43 @@ import numpy as np
 # used after python 3.6:
 # https://stackoverflow.com/q/42263962/10764631
 __path__=[os.path.dirname(os.path.abspath(__file__))]
+import atom_utils
+import cache_utils
 import io_utils
 import str_utils
 
 version = '20200213'
 
 
+def parse_list(value):
+    """Convert '[a,b,c]' (or 'a,b,c') from command line to ['a', 'b', 'c']."""
+    value = value.strip()
+    if value.startswith('['):
+        value = value[1:]
+    if value.endswith(']'):
+        value = value[:-1]
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def parse_species(values, option, convert):
+    """Convert ['Si=1', 'O=2'] from command line to {'Si': 1, 'O': 2}."""
+    if values is None:
+        return None
+    result = {}
+    for each_argu in values:
+        if each_argu.find('=') == -1:
+            print('cannot find "=" in {} of {}'.format(each_argu, option))
+            exit()
+        name, value = each_argu.split('=', 1)
+        try:
+            result[name.strip()] = convert(value)
+        except (ValueError) as e:
+            print('ValueError! Invalid value of {} is given!'.format(option))
+            print(e)
+            exit()
+    return result
+
+
 def getArgs(argv=None):
     """Get arguments from command line."""
     # parser:
@@ -43,16 +76,14 @@ def getArgs(argv=None):
         -c command in the same order.  The size of box in x, y direction
         depends on the first structure created with -c command.
 
-        str: structure, available options are:
-            si_001, sio2_beta_Cristobalite(or sio2_beta), 
-            c_diamond,
+        str: structure, available options (and recommended lattice
+             constant) are:
+""" + str_utils.structure_help() + """
+            sio2_beta_Cristobalite is the same as sio2_beta.
+            New structures can be added to str_utils.STRUCTURES.
         la: lattice constant for this structure (in Angstrum).
             Sometimes it might be possible to slightly tweak the lattice
             constant to match xc and yc at interface between structures.
-            recommand:
-                si_001: 5.431
-                sio2_beta: 7.126
-                c_diamond: 3.57
         xc: number of unit cell in x
         yc: number of unit cell in y
         zc: number of unit cell in z
@@ -69,8 +100,13 @@ def getArgs(argv=None):
         reg: region to be considered, available regions are:
              box, cylinder, sphere
         par: parameters for region (no space in [...])
+             box: [xlo,xhi,ylo,yhi,zlo,zhi]
+             cylinder: [axis,xlo,ylo,zlo,height,radius], axis = x, y or z,
+                 (xlo,ylo,zlo) is center of the lowest point along axis
+             sphere: [cx,cy,cz,radius]
         in: =1, particles inside the region and in container will be removed.
             =0,           outside               in
+        -d commands are applied in the same order as they are given.
 
         zhi -------------------------  container
             |         _              |
@@ -80,10 +116,23 @@ def getArgs(argv=None):
         zlo -------------------------
             xlo                     xhi
 
+    -ov (--overlap) = remove atoms at interfaces between -c structures that
+        are closer than a cutoff to atoms of the structure right below.
+        Only atoms within win of each interface are checked.
+
+        cut: default minimum distance between atoms, default = 1.0
+        win: window below/above each interface, default = 3.0
+        mode: remove: atoms of the upper structure are removed (default)
+              merge: same as remove, and the lower atom is moved to the
+                     midpoint of the pair
+        sp1-sp2: minimum distance of a species pair, ex: Si-O=1.4
+
     -o (--output_file) = output file
     (1) if filename extension = lammpstrj (LAMMPS dump file), coordinates will
         be in lammpstrj format.
         (currently no comment lines are allowed in this .lammpstrj format)
+        Atoms are written chunk by chunk (see -ch), the number of atoms and
+        the upper z bound in the header are padded with spaces.
         default =./structure_date.lammpstrj
 
         example:
@@ -111,6 +160,7 @@ def getArgs(argv=None):
                                              "s/Si/1/g" )
         sed -e "s/ Si /1/g" -i file.lammpstrj
         sed -e "s/ O /2/g" -i file.lammpstrj
+        (or use (3) to write type numbers directly)
 
     (2) if filename extension = xyz, coordinates will be in xyz format.
 
@@ -127,10 +177,90 @@ def getArgs(argv=None):
         ..
         ...
 
+    (3) if filename extension = data, coordinates will be in LAMMPS data
+        file format (read_data), species are written as type numbers.
+
+        -tm (--type_map) = type number of each species, ex: -tm Si=1 O=2,
+            default is the order species appear in -c structures
+        -ms (--mass) = mass of species, ex: -ms Si=28.0855, default is the
+            standard atomic weight of common elements
+        -q (--charge) = charge of species, ex: -q Si=2.4 O=-1.2, atoms are
+            written in atom_style charge (id type q x y z) if it's given,
+            otherwise in atom_style atomic (id type x y z)
+
+        example:
+
+        LAMMPS data file, species: Si=1 O=2
+
+        1000 atoms
+        2 atom types
+
+        0.0 21.72 xlo xhi
+        0.0 27.15 ylo yhi
+        0.0 54.3 zlo zhi
+
+        Masses
+
+        1 28.085 # Si
+        2 15.999 # O
+
+        Atoms # atomic
+
+        1 1 0.0 0.0 0.0
+        2 1 2.7155 2.7155 0.0
+        .
+        ..
+        ...
+
+    (4) if filename extension = npz, h5 or hdf5, columns of atoms (atom_id,
+        type_code, pos) are saved in binary with full precision, with
+        species, box bounds and metadata (arguments of this script).
+        h5 and hdf5 need h5py.  Use io_utils.read_binary() to read it, its
+        columns are memory-mapped if they are not compressed.
+
+        -cz (--compress) = compress columns of npz/h5 file, compressed
+            columns are read into memory instead of memory-mapped
+
+    (5) lammpstrj, xyz and data files are compressed if .gz, .bz2 or .xz is
+        added to the filename, ex: -o structure.lammpstrj.gz.  Compression
+        runs in a background thread while atoms are formatted, and the
+        header is patched without rewriting the compressed atoms.  gz is
+        the fastest, xz the smallest and the slowest.
+
+    -pr (--precision) = number of digits after decimal point of coordinates
+        in output file, ex: -pr 6 writes 1.357750, default is the shortest
+        number that reads back the same coordinate (ex: 1.35775).
+        Formatting with a fixed precision is a few times faster.
+
+    -ca (--cache) = directory of cache of built structures.  Each chunk of
+        a -c structure is saved as a .npy file (25 bytes per atom), keyed by
+        structure, lattice, number of cells and bounds, and it is loaded
+        instead of being built again next time (-d, -ov are applied after
+        loading, so they can be changed).
+    -cs (--cache_size) = size cap of cache directory in MB, least recently
+        used files are removed, default = 1024
+
+    -pl (--pipeline) = write chunks in a background thread while the next
+        chunks are built (with -np processes), ex: -pl 2 lets 2 chunks
+        wait to be written.  Output is the same as without -pl, the atom
+        count and z upper bound in the header are patched at the end.
+        Each waiting chunk takes memory of one chunk (-ch).
+
+    -dr (--dry_run) = only print the number of atoms, memory and size of
+        output file predicted for each -c structure, no atom is built.
+        Atoms deleted with -d and -ov are not known before they are built,
+        so the predicted numbers are upper bounds.
+
     example:
     python3 ./create_structure.py -c str=si_001 la=5.43 xc=4 yc=5 zc=6  zs=0
     python3 ./create_structure.py -c str=si_001 la=5.43 xc=4 yc=5 zc=6  zs=0.0
                                   -o 20190730_si_001_4_5_6_v01.xyz
+    python3 ./create_structure.py -c str=si_001 la=5.431 xc=10 yc=10 zc=10
+                                  zs=0
+                                  -d con=[0,54.31,0,54.31,20,54.31]
+                                     reg=cylinder par=[z,27,27,20,40,10] in=1
+                                  -d con=[0,54.31,0,54.31,0,54.31]
+                                     reg=sphere par=[27,27,20,8] in=1
 
 
     """, formatter_class=argparse.RawTextHelpFormatter)
@@ -176,7 +306,96 @@ def getArgs(argv=None):
 
     # arguments to output file
     parser.add_argument("-o", "--output_file", help="output file")
-    ext_set = set(['xyz', 'lammpstrj'])
+    ext_set = set(['xyz', 'lammpstrj', 'data'] + list(io_utils.BINARY_EXT))
+
+    # arguments to binary output file
+    parser.add_argument(
+            "-cz", "--compress", action='store_true',
+            help="""
+            compress columns of npz, h5 or hdf5 output file
+            """)
+
+    # arguments to LAMMPS data file
+    parser.add_argument(
+            "-tm", "--type_map", nargs='+',
+            help="""
+            type number of each species in data file, ex: Si=1 O=2
+            """)
+    parser.add_argument(
+            "-ms", "--mass", nargs='+',
+            help="""
+            mass of species in data file, ex: Si=28.0855 O=15.999
+            """)
+    parser.add_argument(
+            "-q", "--charge", nargs='+',
+            help="""
+            charge of species in data file, ex: Si=2.4 O=-1.2
+            """)
+
+    # arguments to remove overlap at interfaces between structures
+    parser.add_argument(
+            "-ov", "--overlap", nargs='*',
+            help="""
+            -ov
+            cut=default minimum distance between atoms (in Angstrum)
+            win=window below/above each interface (in Angstrum)
+            mode=remove or merge
+            sp1-sp2=minimum distance of a species pair, ex: Si-O=1.4
+            """)
+    overlap_arg_set = set(['cut', 'win', 'mode'])
+
+    # arguments to number of processes
+    parser.add_argument(
+            "-np", "--num_proc", type=int, default=1,
+            help="""
+            number of processes to build and delete atoms, each process
+            works on a z slab of chunk_size atoms, default = 1
+            """)
+
+    # arguments to size of chunks
+    parser.add_argument(
+            "-ch", "--chunk_size", type=int, default=1000000,
+            help="""
+            number of atoms (approximately) built, filtered and written at
+            a time, it sets the peak memory, default = 1000000
+            """)
+
+    # arguments to pipeline of building and writing
+    parser.add_argument(
+            "-pl", "--pipeline", type=int, default=0,
+            help="""
+            write chunks in a background thread while the next chunks are
+            built, the value is the number of chunks waiting to be written
+            (each takes memory of a chunk), default = 0 (no pipeline)
+            """)
+
+    # arguments to precision of coordinates in output file
+    parser.add_argument(
+            "-pr", "--precision", type=int, default=None,
+            help="""
+            number of digits after decimal point of coordinates,
+            default = shortest repr of each coordinate
+            """)
+
+    # arguments to cache of built structures
+    parser.add_argument(
+            "-ca", "--cache",
+            help="""
+            directory of cache of built structures, default = no cache
+            """)
+    parser.add_argument(
+            "-cs", "--cache_size", type=float, default=1024.0,
+            help="""
+            size cap of cache directory in MB, default = 1024
+            """)
+
+    # arguments to predict atoms without building them
+    parser.add_argument(
+            "-dr", "--dry_run", action='store_true',
+            help="""
+            print predicted number of atoms, memory and size of output
+            file, without building atoms
+            """)
 
     args = parser.parse_args()
 
@@ -237,10 +456,52 @@ def getArgs(argv=None):
                     print('invalid argument "{}" for -d'.format(var))
                     print('only use valid argument for -d: ', delete_arg_set)
                     exit()
-                delete_dict[(indx_create, var)] = value
+                delete_dict[(indx_delete, var)] = value
     else:
+        num_delete = 0
+        delete_dict = {}
         print('\nno -d is given.')
         #exit()
+
+    # convert delete regions to a list of [con, reg, par, in]
+    delete_list = []
+    for indx_delete in range(1, num_delete+1):
+        try:
+            con = [float(v) for v in
+                   parse_list(delete_dict[indx_delete, 'con'])]
+            reg = delete_dict[indx_delete, 'reg'].lower().strip()
+            par = parse_list(delete_dict[indx_delete, 'par'])
+            inside = int(float(delete_dict[indx_delete, 'in']))
+            if reg == 'cylinder':
+                par = par[:1] + [float(v) for v in par[1:]]
+            else:
+                par = [float(v) for v in par]
+        except (KeyError) as e:
+            print('{} is missing in -d {}, use -h for help.'.format(
+                e.args[0][1], indx_delete))
+            exit()
+        except (ValueError) as e:
+            print('ValueError! Invalid delete info (-d {}) is given!'.format(
+                indx_delete))
+            print(e)
+            exit()
+        if len(con) != 6:
+            print('con of -d {} needs 6 values: {}'.format(indx_delete, con))
+            exit()
+        if reg not in str_utils.REGIONS:
+            print('invalid region "{}" for -d {}'.format(reg, indx_delete))
+            print('only use valid region: ', sorted(str_utils.REGIONS))
+            exit()
+        if inside not in (0, 1):
+            print('in of -d {} needs to be 0 or 1'.format(indx_delete))
+            exit()
+        # a bad par is found here instead of after the output is opened
+        try:
+            str_utils.check_region(reg, par)
+        except (ValueError) as e:
+            print('invalid par of -d {}: {}'.format(indx_delete, e))
+            exit()
+        delete_list.append([con, reg, par, inside])
 #
     # parse the information for creating output files
     # use filename extension to determine which format will be output
@@ -257,6 +518,21 @@ def getArgs(argv=None):
             print('Invalid filename extension for {}'.format(output_file))
             print('Only {} are available'.format(ext_set))
             exit()
+        compression = io_utils.compression_of(output_file)
+        num_suffix = 3 if compression else 2
+        if len(output_file.split('.')) > num_suffix:
+            print('Invalid filename extension for {}'.format(output_file))
+            print('Only {} are available for compression'.format(
+                io_utils.COMPRESSION))
+            exit()
+        if compression and ext.lower() in io_utils.BINARY_EXT:
+            print('{} can not be compressed as {}, use -cz to compress '
+                  'columns'.format(ext, compression))
+            exit()
+        if ext.lower() in ('h5', 'hdf5') and io_utils.h5py is None:
+            print('h5py is needed to write {}, install it or use '
+                  '.npz'.format(output_file))
+            exit()
         print('output to {} format'.format(ext))
     else:
         date = datetime.datetime.now()
@@ -266,35 +542,136 @@ def getArgs(argv=None):
         print('set output_file to : {}'.format(output_file))
 
 
-    arg_pack = [num_create, create_arg_set, create_dict, output_file]
+    # parse the information for removing overlap at interfaces
+    if args.overlap is not None:
+        overlap = {'cut': 1.0, 'win': 3.0, 'mode': 'remove', 'pair': {}}
+        print('\ninformation of overlap removal: {}'.format(args.overlap))
+        for each_argu in args.overlap:
+            if each_argu.find('=') == -1:
+                print('cannot find "=" in {}'.format(each_argu))
+                exit()
+            var, value = each_argu.split('=', 1)
+            try:
+                if var in ('cut', 'win'):
+                    overlap[var] = float(value)
+                elif var == 'mode':
+                    overlap[var] = value.lower().strip()
+                elif var.find('-') > -1:
+                    overlap['pair'][var] = float(value)
+                else:
+                    print('invalid argument "{}" for -ov'.format(var))
+                    print('only use valid argument for -ov: ',
+                          overlap_arg_set, 'or sp1-sp2')
+                    exit()
+            except (ValueError) as e:
+                print('ValueError! Invalid overlap info (-ov) is given!')
+                print(e)
+                exit()
+        if overlap['mode'] not in ('remove', 'merge'):
+            print('mode of -ov needs to be remove or merge')
+            exit()
+        cut_max = max([overlap['cut']] + list(overlap['pair'].values()))
+        if overlap['win'] < cut_max:
+            print('win ({}) of -ov < cutoff ({}), set win to {}'.format(
+                overlap['win'], cut_max, cut_max))
+            overlap['win'] = cut_max
+    else:
+        overlap = None
+
+    # species to type number, masses and charges of LAMMPS data file
+    data_info = {'type_map': parse_species(args.type_map, '-tm', int),
+                 'masses': parse_species(args.mass, '-ms', float),
+                 'charges': parse_species(args.charge, '-q', float)}
+
+    chunk_size = args.chunk_size
+    num_proc = max(1, args.num_proc)
+    pipeline = max(0, args.pipeline)
+
+    # cache of built structures
+    if args.cache:
+        cache = cache_utils.LatticeCache(args.cache,
+                                         args.cache_size*1024**2)
+        print('\ncache of structures: {} ({} MB)'.format(cache.cache_dir,
+                                                        args.cache_size))
+    else:
+        cache = None
+
+    arg_pack = [num_create, create_arg_set, create_dict, output_file,
+                chunk_size, delete_list, overlap, num_proc, args.dry_run,
+                cache, args.precision, data_info, args.compress, pipeline]
     #return num_create, create_arg_set, create_dict, output_file
     return arg_pack
 
 
+def dry_run_report(str_list, ext, chunk_size, num_proc, precision=None,
+                   pipeline=0):
+    """Print predicted number of atoms, memory and size of output file.
+
+    # Arguments
+        str_list: list of [structure, lattice, num_x_cell, num_y_cell,
+            num_z_cell, xyz_bound] of each -c structure
+        ext: filename extension of output file
+        chunk_size: number of atoms in each chunk (approximately)
+        num_proc: number of processes
+        precision: number of digits after decimal point of coordinates
+        pipeline: number of chunks waiting to be written (-pl)
+
+    # Date
+        20261018
+    """
+    MB = 1024.0**2
+    total_atom = 0
+    total_size = 0
+    chunk_atom = 0
+    print('')
+    print('dry run, atoms are not built')
+    for indx_str, [structure, lattice, num_x_cell, num_y_cell,
+                   num_z_cell, xyz_bound] in enumerate(str_list, 1):
+        pred = str_utils.predict_lattice(structure,
+                                         num_x_cell,
+                                         num_y_cell,
+                                         num_z_cell,
+                                         xyz_bound,
+                                         lattice=lattice,
+                                         chunk_size=chunk_size)
+        size = io_utils.estimate_file_size(ext,
+                                           pred['sample'],
+                                           pred['num_atom'],
+                                           id_start=total_atom+1,
+                                           precision=precision)
+        print('')
+        print('structure {} : {}'.format(indx_str, structure))
+        print('number of atoms : {}'.format(pred['num_atom']))
+        print('number of chunks: {}'.format(pred['num_chunk']))
+        print('size in {:9s} : {:.3f} MB'.format(ext, size/MB))
+        total_atom = total_atom + pred['num_atom']
+        total_size = total_size + size
+        chunk_atom = max(chunk_atom, pred['chunk_atom'])
+
+    bytes_per_atom = atom_utils.BYTES_PER_ATOM
+    print('')
+    print('number of atoms (before -d and -ov) : {}'.format(total_atom))
+    print('memory of all atoms at once  : {:.3f} MB'.format(
+        total_atom*bytes_per_atom/MB))
+    # chunks built by processes, waiting in the pipeline and being written
+    num_chunk = max(1, num_proc) + (pipeline + 1 if pipeline > 0 else 0)
+    print('memory of atoms in chunks    : {:.3f} MB'.format(
+        chunk_atom*bytes_per_atom*num_chunk/MB))
+    print('size of output file          : {:.3f} MB'.format(total_size/MB))
+
+    return
+
+
 ###############################################################################
 #def create_structure(num_create, create_arg_set, create_dict, output_file):
 def create_structure(arg_pack):
-    [num_create, create_arg_set, create_dict, output_file] = arg_pack
+    [num_create, create_arg_set, create_dict, output_file,
+     chunk_size, delete_list, overlap, num_proc, dry_run,
+     cache, precision, data_info, compress, pipeline] = arg_pack
     # current directory
     # current_dir = os.getcwd()
 
-    # check if output_file exist, and get it's extension
     ext = output_file.split('.')[1].lower()
-    output_file_path = os.path.realpath(output_file)
-    if not os.path.isfile(output_file_path):
-        print('\ncreate output_file: {}'.format(output_file_path))
-    else:
-        print('\noutput_file exist: {}'.format(output_file_path))
-        overwrite = input('overwrite or append the file ? (y or n) ')
-        overwrite = overwrite.strip().lower()
-        if overwrite == 'y':
-            print('overwrite it !')
-        elif overwrite == 'n':
-            print('not overwrite it, script exits!')
-            exit()
-        else:
-            print('invalid input, only y or n are available')
-            exit()
 
     # print('')
     # print(num_create)
@@ -302,15 +679,9 @@ def create_structure(arg_pack):
     # print(create_dict)
     # print(output_file)
 
-    # create empty list for atom_id, atom_type, x, y, z
-    atom_id = []
-    atom_type = []
-    x = []
-    y = []
-    z = []
-    Ncount = 0
-
-    # create atoms
+    # get info of all structures before building them, so that the script
+    # exits before writing output_file if any structure is invalid
+    str_list = []
     for indx_str in np.arange(1, num_create+1):
 
         # get info of structure
@@ -326,6 +697,13 @@ def create_structure(arg_pack):
             print(e)
             exit()
 
+        # look up unit cell of this structure
+        structure, entry = str_utils.get_structure(structure)
+        if entry is None:
+            print('Invalid structure {}, use -h for help'.format(structure))
+            exit()
+        cell = entry['cell']
+
         # lower and upper bound of this structure
         if indx_str == 1 and z_start != 0.0:
             print('')
@@ -335,9 +713,9 @@ def create_structure(arg_pack):
         x_lo = 0.0
         y_lo = 0.0
         z_lo = z_start
-        x_hi = num_x_cell * lattice
-        y_hi = num_y_cell * lattice
-        z_hi = z_lo + num_z_cell * lattice
+        x_hi = num_x_cell * lattice * cell[0]
+        y_hi = num_y_cell * lattice * cell[1]
+        z_hi = z_lo + num_z_cell * lattice * cell[2]
         xyz_bound = [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi]
 
         # get size of box in x, y dimension based on the first structure
@@ -380,126 +758,247 @@ def create_structure(arg_pack):
         print('z_lo       : {}'.format(z_lo))
         print('z_hi       : {}'.format(z_hi))
 
-        # build atoms
-        if ((structure == 'si_001') or 
-            (structure == 'c_diamond')):
-            print('start building {} structure...'.format(structure))
-            tmp_id, tmp_type, tmp_x, tmp_y, tmp_z = str_utils.si_001(
-                    num_x_cell,
-                    num_y_cell,
-                    num_z_cell,
-                    xyz_bound,
-                    lattice=lattice)
+        str_list.append([structure, lattice,
+                         num_x_cell, num_y_cell, num_z_cell, xyz_bound])
+
+    # species of all structures, for type numbers of LAMMPS data file
+    if ext == 'data':
+        species = []
+        for structure, *_ in str_list:
+            entry = str_utils.get_structure(structure)[1]
+            for name in str_utils.basis_species(entry['basis']):
+                if name not in species:
+                    species.append(name)
+        type_map = data_info['type_map']
+        if type_map is None:
+            type_map = {name: indx for indx, name in enumerate(species, 1)}
+        masses = data_info['masses'] or {}
+        charges = data_info['charges']
+        # write_data_header() needs a species for every type number
+        type_numbers = set(type_map.values())
+        missing = [indx for indx in range(1, max(type_numbers)+1)
+                   if indx not in type_numbers]
+        if min(type_numbers) < 1 or missing:
+            print('type numbers of -tm need to run from 1 without gaps: '
+                  '{}'.format(type_map))
+            if missing:
+                print('no species for type {}'.format(missing))
+            exit()
+        for name in species:
+            if name not in type_map:
+                print('type number of {} is not given (-tm)'.format(name))
+                exit()
+            if charges is not None and name not in charges:
+                print('charge of {} is not given (-q)'.format(name))
+                exit()
+        for name in type_map:
+            if name not in masses and name not in io_utils.ATOMIC_MASS:
+                print('mass of {} is not given (-ms)'.format(name))
+                exit()
+        print('')
+        print('type number of species in data file:')
+        for name, indx in sorted(type_map.items(), key=lambda item: item[1]):
+            print('{:10s} : {}'.format(name, indx))
 
-            # increment of atom_id if there are more than 1 structure
-            tmp_id = np.array(tmp_id) + Ncount
+    if dry_run:
+        dry_run_report(str_list, ext, chunk_size, num_proc, precision,
+                       pipeline)
+        return
 
-            # accumulate total number of atoms
-            Ncount = Ncount + len(tmp_id)
+    # check if output_file exist
+    output_file_path = os.path.realpath(output_file)
+    if not os.path.isfile(output_file_path):
+        print('\ncreate output_file: {}'.format(output_file_path))
+    else:
+        print('\noutput_file exist: {}'.format(output_file_path))
+        overwrite = input('overwrite or append the file ? (y or n) ')
+        overwrite = overwrite.strip().lower()
+        if overwrite == 'y':
+            print('overwrite it !')
+        elif overwrite == 'n':
+            print('not overwrite it, script exits!')
+            exit()
+        else:
+            print('invalid input, only y or n are available')
+            exit()
 
-            atom_id = np.append(atom_id, tmp_id)
-            atom_type = np.append(atom_type, tmp_type)
-            x = np.append(x, tmp_x)
-            y = np.append(y, tmp_y)
-            z = np.append(z, tmp_z)
+    # min/max of coordinates and number of atoms, updated chunk by chunk
+    stat = {'min': np.full(3, np.inf), 'max': np.full(3, -np.inf),
+            'created': 0, 'kept': 0}
 
-        elif ((structure == 'sio2_beta') or
-              (structure == 'sio2_beta_Cristobalite')):
+    def atom_chunks():
+        """Build, filter and yield atoms chunk by chunk."""
+        Ncount = 0
+        for indx_str, [structure, lattice, num_x_cell, num_y_cell,
+                       num_z_cell, xyz_bound] in enumerate(str_list):
 
+            # build atoms, atom_id continues from previous structure
             print('start building {} structure...'.format(structure))
-
-            tmp_id, tmp_type, tmp_x, tmp_y, tmp_z =                           \
-                str_utils.sio2_beta_Cristobalite(num_x_cell,
-                                                 num_y_cell,
-                                                 num_z_cell,
-                                                 xyz_bound,
-                                                 lattice=lattice)
-
-            # increment of atom_id if there are more than 1 structure
-            tmp_id = np.array(tmp_id) + Ncount
-
-            # accumulate total number of atoms
-            Ncount = Ncount + len(tmp_id)
-
-            atom_id = np.append(atom_id, tmp_id)
-            atom_type = np.append(atom_type, tmp_type)
-            x = np.append(x, tmp_x)
-            y = np.append(y, tmp_y)
-            z = np.append(z, tmp_z)
+            if pool is not None:
+                # build and delete particles with -d regions in workers
+                for table in str_utils.iter_lattice_parallel(
+                        pool,
+                        num_proc,
+                        structure,
+                        num_x_cell,
+                        num_y_cell,
+                        num_z_cell,
+                        xyz_bound,
+                        lattice=lattice,
+                        chunk_size=chunk_size,
+                        id_start=Ncount+1,
+                        delete_list=delete_list,
+                        box=[x_box_min, x_box_max, y_box_min, y_box_max],
+                        report=stat,
+                        cache=cache):
+                    yield indx_str, table
+                Ncount = stat['created']
+                continue
+
+            for table in str_utils.iter_lattice(
+                    structure,
+                    num_x_cell,
+                    num_y_cell,
+                    num_z_cell,
+                    xyz_bound,
+                    lattice=lattice,
+                    chunk_size=chunk_size,
+                    id_start=Ncount+1,
+                    cache=cache):
+
+                # accumulate total number of atoms
+                Ncount = Ncount + len(table)
+                stat['created'] = stat['created'] + len(table)
+
+                # delete particles with -d regions in order
+                table = str_utils.delete_atoms(
+                    table,
+                    delete_list,
+                    [x_box_min, x_box_max, y_box_min, y_box_max],
+                    lattice)
+
+                yield indx_str, table
+
+    def output_chunks():
+        """Remove overlap at interfaces (-ov) and count atoms to be written.
+        """
+        chunks = atom_chunks()
+        if overlap is None:
+            chunks = (table for indx_str, table in chunks)
         else:
-            print('Invalid structure {}, use -h for help'.format(structure))
-            exit()
-
-    # atom_id needs to be integers
-    atom_id = atom_id.astype(int)
-
-    # remove particles if it is not inside of region
-    print(atom_id.shape)
-
-    # box
-    #region = [18, 68, 18, 68, 10000]
-    # cylinder
-    #region = ['z', 20, 30, 0, 1000, 20]
-    #region = ['x', 20, 30, 20, 1000, 10]
-    #region = ['y', 30, 20, 1000, 10]
-    # sphere
-    region = [-40, -50, -60, 10]
-    mask = np.ones(len(atom_id), dtype=bool)
-    for indx, aid in enumerate(atom_id):
-        xtmp = x[indx]
-        ytmp = y[indx]
-        ztmp = z[indx]
-        coor = [xtmp, ytmp, ztmp]
-
-        # if str_utils.inside_box(coor, region):
-        # if str_utils.inside_cylinder(coor, region):
-        # if not str_utils.inside_cylinder(coor, region):
-        if str_utils.inside_sphere(coor, region):
-            mask[indx] = False
-    x = x[mask]
-    y = y[mask]
-    z = z[mask]
-    atom_id = atom_id[mask]
-    atom_type = atom_type[mask]
-    print(atom_id.shape)
-
-    #
-    z_box_max = np.max(z)
-    box = np.array([
+            chunks = str_utils.clean_interfaces(
+                chunks,
+                [xyz_bound[4] for *_, xyz_bound in str_list],
+                [x_box_min, x_box_max, y_box_min, y_box_max, z_box_min, None],
+                overlap['win'],
+                overlap['cut'],
+                pair_cutoff=overlap['pair'],
+                mode=overlap['mode'],
+                report=stat)
+
+        for table in chunks:
+            stat['kept'] = stat['kept'] + len(table)
+            if len(table) > 0:
+                stat['min'] = np.minimum(stat['min'],
+                                         table.pos.min(axis=1))
+                stat['max'] = np.maximum(stat['max'],
+                                         table.pos.max(axis=1))
+            yield table
+
+    # z_box_max is max z of atoms, it's patched after all atoms are written
+    box = [
         x_box_min, x_box_max,
         y_box_min, y_box_max,
-        z_box_min, z_box_max
-        ])
-
-    # write coordinate of atom
-    # status = 'w' : write
-    #          'a' : append
-    if ext == 'lammpstrj':
-        io_utils.write_lammpstrj(output_file,
-                                 box,
-                                 atom_id,
-                                 atom_type,
-                                 x, y, z,
-                                 timestep=0,
-                                 status='w')
-    elif ext == 'xyz':
-        io_utils.write_xyz(output_file,
-                           atom_id,
-                           atom_type,
-                           x, y, z,
-                           timestep=0,
-                           status='w')
+        z_box_min, None
+        ]
+
+    # process pool to build atoms, None to build them in this process
+    if num_proc > 1:
+        print('build atoms with {} processes'.format(num_proc))
+        pool = multiprocessing.Pool(num_proc)
     else:
-        print('Unknow file extension!')
+        pool = None
+
+    def write_chunks(chunks):
+        """Write chunks to output_file in the format of its extension."""
+        if ext == 'lammpstrj':
+            io_utils.write_lammpstrj_chunks(output_file,
+                                            box,
+                                            chunks,
+                                            timestep=0,
+                                            precision=precision)
+        elif ext == 'data':
+            io_utils.write_data_chunks(output_file,
+                                       box,
+                                       chunks,
+                                       type_map,
+                                       masses=masses,
+                                       charges=charges,
+                                       precision=precision)
+        elif ext in io_utils.BINARY_EXT:
+            metadata = {'version': version,
+                        'date': datetime.datetime.now().isoformat(),
+                        'command': ' '.join(sys.argv),
+                        'structures': [[structure, lattice, num_x_cell,
+                                        num_y_cell, num_z_cell, xyz_bound]
+                                       for [structure, lattice, num_x_cell,
+                                            num_y_cell, num_z_cell,
+                                            xyz_bound] in str_list],
+                        'delete': delete_list,
+                        'overlap': overlap}
+            io_utils.write_binary_chunks(output_file,
+                                         box,
+                                         chunks,
+                                         compress=compress,
+                                         metadata=metadata)
+        elif ext == 'xyz':
+            io_utils.write_xyz_chunks(output_file,
+                                      chunks,
+                                      timestep=0,
+                                      precision=precision)
+        else:
+            print('Unknow file extension!')
+
+    # write coordinate of atom chunk by chunk, in a writer thread if -pl is
+    # given so that building the next chunks overlaps writing
+    try:
+        if pipeline > 0:
+            print('write chunks in a pipeline of {} chunks'.format(pipeline))
+            io_utils.write_chunks_pipelined(write_chunks,
+                                            output_chunks(),
+                                            queue_size=pipeline)
+        else:
+            write_chunks(output_chunks())
+    except BaseException:
+        # compressed output is written to a temporary file of atoms first,
+        # don't leave it behind
+        if os.path.exists(output_file + '.part'):
+            os.remove(output_file + '.part')
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     print('')
+    print('number of atoms created : {}'.format(stat['created']))
+    if overlap is not None:
+        print('number of atoms removed at interfaces : {}'.format(
+            stat['removed']))
+        print('number of atoms merged at interfaces  : {}'.format(
+            stat['merged']))
+    print('number of atoms written : {}'.format(stat['kept']))
+    if cache is not None:
+        print('chunks loaded from cache: {} (built: {})'.format(
+            cache.hits, cache.misses))
+    print('')
     print('Min/Max of particle coordinates:')
-    print('x min       : {}'.format(np.min(x)))
-    print('x max       : {}'.format(np.max(x)))
-    print('y min       : {}'.format(np.min(y)))
-    print('y max       : {}'.format(np.max(y)))
-    print('z min       : {}'.format(np.min(z)))
-    print('z max       : {}'.format(np.max(z)))
+    print('x min       : {}'.format(stat['min'][0]))
+    print('x max       : {}'.format(stat['max'][0]))
+    print('y min       : {}'.format(stat['min'][1]))
+    print('y max       : {}'.format(stat['max'][1]))
+    print('z min       : {}'.format(stat['min'][2]))
+    print('z max       : {}'.format(stat['max'][2]))
     print('Challenge accomplished !!')
 
 
@@ -1,158 +1,723 @@
 """Utilities related to structure."""
 
 import numpy as np
-
-
-# ref:
-#
-# lattice constant:
-# https://physics.nist.gov/cgi-bin/cuu/Value?asil
-#
-def si_001(num_x_cell,
-           num_y_cell,
-           num_z_cell,
-           xyz_bound,
-           lattice=5.431):
-    """Generate coordinate of si 001 structure.
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+try:
+    from . import atom_utils
+    from . import cache_utils
+    from . import cell_utils
+except ImportError:
+    import atom_utils
+    import cache_utils
+    import cell_utils
+
+# version of build_lattice(), change it when atoms it builds are changed,
+# so that cached lattices (cache_utils) are not used any more
+LATTICE_VERSION = '20261018'
+
+
+def build_lattice(basis,
+                  num_x_cell,
+                  num_y_cell,
+                  num_z_cell,
+                  xyz_bound,
+                  lattice,
+                  cell=(1.0, 1.0, 1.0),
+                  k_start=0,
+                  id_start=1,
+                  out=None,
+                  i_start=0,
+                  j_start=0):
+    """Generate coordinate of a lattice from its fractional basis.
+
+    Atoms are ordered the same way as the nested loops used before:
+    z cell (k), layer of the unit cell, y cell (j), x cell (i), then atoms
+    in that layer.  A layer is skipped if its z coordinate is larger than
+    z_hi, the same as before.
 
     # Arguments
-        lattice: lattice constant of this structure, default = 5.431 A
+        basis: list of layers in unit cell, each layer is
+            [fz, [[fx, fy, species], ...]]
+            fx, fy, fz: fractional coordinate in unit cell
+            species: species of this atom
         num_x_cell: number of unit cell in x
         num_y_cell: number of unit cell in y
         num_z_cell: number of unit cell in z
         xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure
+        cell: size of unit cell in x, y, z in unit of lattice constant,
+            default = (1.0, 1.0, 1.0) for cubic cell
+        k_start: index of first z cell to be built, cells k_start to
+            k_start + num_z_cell - 1 are built, default = 0
+        id_start: atom id of first atom, default = 1
+        out: AtomTable with exactly count_lattice() atoms (ex: a slice of a
+            larger table) to be filled in place, default = None to allocate
+            a new table
+        i_start, j_start: index of first x and y cell to be built, the same
+            as k_start, default = 0 (used to build a few sample cells)
 
     # Return
-        array of
-        x : coordinate in x direction
-        y :               y
-        z :               z
-        atom_id : atom id of each atom
-        atom_type : type of each atom
+        AtomTable of atoms (out if given), atom id starts from id_start
 
     # Example
+        table = build_lattice(
+            [[0.0, [[0.0, 0.0, 'Si'], [0.5, 0.5, 'Si']]]],
+            4, 4, 4, [0.0, 21.724, 0.0, 21.724, 0.0, 21.724], 5.431)
 
     # Date
-        20190821
+        20261018
     """
-    # warning if lattice constant is different from default value
-    lattice_default = 5.431
-    if abs(lattice - lattice_default) > 1.e-6:
-        print('Warning:')
-        print('Different lattice constant {} from default {} for si_001.'.
-              format(lattice, lattice_default))
-
     # lower and upper bound of this structure
     x_lo = xyz_bound[0]
-    x_hi = xyz_bound[1]
     y_lo = xyz_bound[2]
-    y_hi = xyz_bound[3]
     z_lo = xyz_bound[4]
     z_hi = xyz_bound[5]
 
-    atom_id = []
-    atom_type = []
-    x = []
-    y = []
-    z = []
-    Ncount = 0
-
-    for k in np.arange(num_z_cell):  # z direction
-        for m in [1, 2, 3, 4]:
-            for j in np.arange(num_y_cell):  # y direction
-                for i in np.arange(num_x_cell):  # x direction
-                    # print(k,m,j,i)
-
-                    if m == 1:
-                        if z_lo + k * lattice > z_hi:
-                            continue
-
-                        # atom in the origin of cubic unit cell
-                        x.append(x_lo + i*lattice)
-                        y.append(y_lo + j*lattice)
-                        z.append(z_lo + k*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        # atom on face
-                        x.append(x_lo + (i+0.5)*lattice)
-                        y.append(y_lo + (j+0.5)*lattice)
-                        z.append(z_lo + k*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 2:
-                        if z_lo + (k+0.25)*lattice > z_hi:
-                            continue
-
-                        # atom in cell
-                        x.append(x_lo + (i+0.25)*lattice)
-                        y.append(y_lo + (j+0.25)*lattice)
-                        z.append(z_lo + (k+0.25)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + (i+0.75)*lattice)
-                        y.append(y_lo + (j+0.75)*lattice)
-                        z.append(z_lo + (k+0.25)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 3:
-                        if z_lo + (k+0.5)*lattice > z_hi:
-                            continue
-
-                        # atom on face
-                        x.append(x_lo + (i+0.5)*lattice)
-                        y.append(y_lo + j*lattice)
-                        z.append(z_lo + (k+0.5)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + i*lattice)
-                        y.append(y_lo + (j+0.5)*lattice)
-                        z.append(z_lo + (k+0.5)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 4:
-                        if z_lo + (k+0.75)*lattice > z_hi:
-                            continue
-
-                        # atom in cell
-                        x.append(x_lo + (i+0.75)*lattice)
-                        y.append(y_lo + (j+0.25)*lattice)
-                        z.append(z_lo + (k+0.75)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + (i+0.25)*lattice)
-                        y.append(y_lo + (j+0.75)*lattice)
-                        z.append(z_lo + (k+0.75)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-    return atom_id, atom_type, x, y, z
+    # size of unit cell
+    x_cell = lattice*cell[0]
+    y_cell = lattice*cell[1]
+    z_cell = lattice*cell[2]
+
+    # integer offset of cells in x, y, z
+    i = np.arange(i_start, i_start + num_x_cell)
+    j = np.arange(j_start, j_start + num_y_cell)
+    k = np.arange(k_start, k_start + num_z_cell)
+
+    # fractional coordinate of one z cell, ordered by (layer, j, i, atom)
+    species = []
+    type_list = []
+    fx_list = []
+    fy_list = []
+    fz_list = []
+    for fz, atoms in basis:
+        fxy = np.array([[atom[0], atom[1]] for atom in atoms], dtype=float)
+        for atom in atoms:
+            if atom[2] not in species:
+                species.append(atom[2])
+        code = np.array([species.index(atom[2]) for atom in atoms])
+        # shape (ny, nx, atoms in layer)
+        fx = i[np.newaxis, :, np.newaxis] + fxy[np.newaxis, np.newaxis, :, 0]
+        fy = j[:, np.newaxis, np.newaxis] + fxy[np.newaxis, np.newaxis, :, 1]
+        fx, fy = np.broadcast_arrays(fx, fy)
+        fx_list.append(fx.ravel())
+        fy_list.append(fy.ravel())
+        fz_list.append(np.full(fx.size, fz))
+        type_list.append(np.broadcast_to(code, fx.shape).ravel())
+    fx = np.concatenate(fx_list)
+    fy = np.concatenate(fy_list)
+    fz = np.concatenate(fz_list)
+    code = np.concatenate(type_list)
+
+    # repeat the cell in z, shape (nz, atoms in one z cell)
+    z = z_lo + (k[:, np.newaxis] + fz[np.newaxis, :])*z_cell
+    mask = ~(z > z_hi)
+    num_atom = np.count_nonzero(mask)
+
+    if out is None:
+        out = atom_utils.AtomTable.empty(num_atom, species)
+    elif len(out) != num_atom:
+        raise ValueError('out has {} atoms, {} atoms are built'.format(
+            len(out), num_atom))
+    else:
+        out.species = list(species)
+
+    # x and y only depend on (layer, j, i, atom), broadcast them over k
+    out.pos[0] = np.broadcast_to(x_lo + fx*x_cell, mask.shape)[mask]
+    out.pos[1] = np.broadcast_to(y_lo + fy*y_cell, mask.shape)[mask]
+    out.pos[2] = z[mask]
+    out.type_code[:] = np.broadcast_to(code, mask.shape)[mask]
+    out.atom_id[:] = np.arange(id_start, id_start + num_atom)
+
+    return out
 
 
 #
-# generate coordinates of Beta Cristobalite SiO2
+# basis of unit cells, each layer is [fz, [[fx, fy, species], ...]]
+#
+def fcc_basis(sp):
+    """Basis of face centered cubic cell with 4 atoms."""
+    return [
+        [0.0, [[0.0, 0.0, sp], [0.5, 0.5, sp]]],
+        [0.5, [[0.5, 0.0, sp], [0.0, 0.5, sp]]],
+        ]
+
+
+def bcc_basis(sp):
+    """Basis of body centered cubic cell with 2 atoms."""
+    return [
+        [0.0, [[0.0, 0.0, sp]]],
+        [0.5, [[0.5, 0.5, sp]]],
+        ]
+
+
+def zincblende_basis(sp_fcc, sp_tet):
+    """Basis of zincblende (diamond if sp_fcc == sp_tet) cell with 8 atoms.
+
+    sp_fcc occupies fcc sites, sp_tet occupies tetrahedral sites.
+    """
+    return [
+        # atom in the origin of cubic unit cell and on face
+        [0.0, [[0.0, 0.0, sp_fcc], [0.5, 0.5, sp_fcc]]],
+        # atom in cell
+        [0.25, [[0.25, 0.25, sp_tet], [0.75, 0.75, sp_tet]]],
+        # atom on face
+        [0.5, [[0.5, 0.0, sp_fcc], [0.0, 0.5, sp_fcc]]],
+        # atom in cell
+        [0.75, [[0.75, 0.25, sp_tet], [0.25, 0.75, sp_tet]]],
+        ]
+
+
+def sio2_beta_basis():
+    """Basis of Beta Cristobalite SiO2 cell with 8 Si and 16 O atoms.
+
+    The silicon atoms occupy the positions they take in the diamond (A4)
+    structure, while the oxygen atoms form bridges between them.
+    """
+    return [
+        # Si atom in the origin of cubic unit cell and on face
+        [0.0, [[0.0, 0.0, 'Si'], [0.5, 0.5, 'Si']]],
+        # O atoms
+        [0.125, [[0.125, 0.125, 'O'], [0.375, 0.375, 'O'],
+                 [0.625, 0.625, 'O'], [0.875, 0.875, 'O']]],
+        # Si atom in cell
+        [0.25, [[0.25, 0.25, 'Si'], [0.75, 0.75, 'Si']]],
+        # O atoms
+        [0.375, [[0.125, 0.375, 'O'], [0.375, 0.125, 'O'],
+                 [0.625, 0.875, 'O'], [0.875, 0.625, 'O']]],
+        # Si atom on face
+        [0.5, [[0.5, 0.0, 'Si'], [0.0, 0.5, 'Si']]],
+        # O atoms
+        [0.625, [[0.625, 0.125, 'O'], [0.875, 0.375, 'O'],
+                 [0.125, 0.625, 'O'], [0.375, 0.875, 'O']]],
+        # Si atom in cell
+        [0.75, [[0.75, 0.25, 'Si'], [0.25, 0.75, 'Si']]],
+        # O atoms
+        [0.875, [[0.125, 0.875, 'O'], [0.375, 0.625, 'O'],
+                 [0.625, 0.375, 'O'], [0.875, 0.125, 'O']]],
+        ]
+
+
+def wurtzite_basis(sp_a, sp_b, u=0.375):
+    """Basis of wurtzite in an orthorhombic cell (a, sqrt(3)a, c), 8 atoms.
+
+    sp_b sits above sp_a by u*c along z, ideal u = 3/8.
+    """
+    return [
+        [0.0, [[0.0, 0.0, sp_a], [0.5, 0.5, sp_a]]],
+        [u, [[0.0, 0.0, sp_b], [0.5, 0.5, sp_b]]],
+        [0.5, [[0.0, 1.0/3.0, sp_a], [0.5, 5.0/6.0, sp_a]]],
+        [0.5 + u, [[0.0, 1.0/3.0, sp_b], [0.5, 5.0/6.0, sp_b]]],
+        ]
+
+
+# registry of structures available for create_structure -c str=...
+#   basis: layers of unit cell, see build_lattice()
+#   lattice: default lattice constant (in Angstrum)
+#   cell: size of unit cell in x, y, z in unit of lattice constant
 #
 # ref:
+# si lattice constant:
+# https://physics.nist.gov/cgi-bin/cuu/Value?asil
+# Beta Cristobalite SiO2:
 # https://homepage.univie.ac.at/michael.leitner/lattice/struk/c9.html
 # http://phycomp.technion.ac.il/~ira/types.html#SiO2
-#
-# lattice constant:
 # https://staff.aist.go.jp/nomura-k/common/struc-coord/b-Cristobalite-c.htm
 #
+STRUCTURES = {
+    'si_001': {
+        'basis': zincblende_basis('Si', 'Si'),
+        'lattice': 5.431,
+        'cell': (1.0, 1.0, 1.0)},
+    'c_diamond': {
+        'basis': zincblende_basis('C', 'C'),
+        'lattice': 3.57,
+        'cell': (1.0, 1.0, 1.0)},
+    'sio2_beta': {
+        'basis': sio2_beta_basis(),
+        'lattice': 7.126,
+        'cell': (1.0, 1.0, 1.0)},
+    'cu_fcc': {
+        'basis': fcc_basis('Cu'),
+        'lattice': 3.615,
+        'cell': (1.0, 1.0, 1.0)},
+    'al_fcc': {
+        'basis': fcc_basis('Al'),
+        'lattice': 4.05,
+        'cell': (1.0, 1.0, 1.0)},
+    'fe_bcc': {
+        'basis': bcc_basis('Fe'),
+        'lattice': 2.8665,
+        'cell': (1.0, 1.0, 1.0)},
+    'w_bcc': {
+        'basis': bcc_basis('W'),
+        'lattice': 3.165,
+        'cell': (1.0, 1.0, 1.0)},
+    'gaas_zincblende': {
+        'basis': zincblende_basis('Ga', 'As'),
+        'lattice': 5.653,
+        'cell': (1.0, 1.0, 1.0)},
+    'sic_3c': {
+        'basis': zincblende_basis('Si', 'C'),
+        'lattice': 4.3596,
+        'cell': (1.0, 1.0, 1.0)},
+    'gan_wurtzite': {
+        'basis': wurtzite_basis('Ga', 'N', u=0.377),
+        'lattice': 3.189,
+        'cell': (1.0, np.sqrt(3.0), 5.185/3.189)},
+    }
+
+# other names of structures in STRUCTURES (lower case)
+STRUCTURE_ALIASES = {
+    'sio2_beta_cristobalite': 'sio2_beta',
+    }
+
+
+def get_structure(structure):
+    """Look up a structure in STRUCTURES.
+
+    # Arguments
+        structure: name of structure (or an alias), case insensitive
+
+    # Return
+        name of structure and its entry in STRUCTURES, or
+        (name, None) if the structure is not available
+
+    # Example
+        name, entry = get_structure('sio2_beta_Cristobalite')
+
+    # Date
+        20261018
+    """
+    name = structure.lower().strip()
+    name = STRUCTURE_ALIASES.get(name, name)
+    return name, STRUCTURES.get(name)
+
+
+def structure_help(indent=12):
+    """List structures in STRUCTURES and their default lattice constant.
+
+    # Arguments
+        indent: number of spaces in front of each line
+
+    # Return
+        a string with one structure in each line, used for help of
+        create_structure.py
+
+    # Date
+        20261018
+    """
+    lines = ['{}{}: {}'.format(' '*indent, name, entry['lattice'])
+             for name, entry in STRUCTURES.items()]
+    return '\n'.join(lines)
+
+
+def lookup_lattice(structure, lattice=None):
+    """Get entry of a structure in STRUCTURES and check lattice constant.
+
+    Script exits if the structure is not available, and a warning is printed
+    if the lattice constant is different from the default one.
+
+    # Arguments
+        structure: name of structure (or an alias)
+        lattice: lattice constant, default is the one in STRUCTURES
+
+    # Return
+        entry of structure in STRUCTURES and lattice constant to be used
+
+    # Date
+        20261018
+    """
+    name, entry = get_structure(structure)
+    if entry is None:
+        print('Unknown structure: {}, script exits'.format(structure))
+        print('available structures: {}'.format(sorted(STRUCTURES)))
+        exit()
+
+    # warning if lattice constant is different from default value
+    lattice_default = entry['lattice']
+    if lattice is None:
+        lattice = lattice_default
+    if abs(lattice - lattice_default) > 1.e-6:
+        print('Warning:')
+        print('Different lattice constant {} from default {} for {}.'.
+              format(lattice, lattice_default, name))
+
+    return entry, lattice
+
+
+def num_atom_per_z_cell(entry, num_x_cell, num_y_cell):
+    """Number of atoms in one z cell (a slab of num_x_cell*num_y_cell cells).
+
+    # Arguments
+        entry: entry of a structure in STRUCTURES
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+
+    # Return
+        number of atoms
+
+    # Date
+        20261018
+    """
+    num_basis = sum(len(atoms) for fz, atoms in entry['basis'])
+    return num_basis * num_x_cell * num_y_cell
+
+
+def z_slabs(entry, num_x_cell, num_y_cell, num_z_cell, chunk_size):
+    """Split z cells into slabs of at most chunk_size atoms (at least one
+    z cell each), the chunks of iter_lattice().
+
+    # Arguments
+        entry: entry of a structure in STRUCTURES
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        chunk_size: maximum number of atoms of a slab
+
+    # Return
+        list of [index of first z cell, number of z cells] of slabs
+
+    # Date
+        20261018
+    """
+    num_cell = max(1, int(chunk_size //
+                          max(1, num_atom_per_z_cell(entry,
+                                                     num_x_cell,
+                                                     num_y_cell))))
+    return [[k_start, min(num_cell, num_z_cell - k_start)]
+            for k_start in range(0, num_z_cell, num_cell)]
+
+
+def basis_species(basis):
+    """Species in a basis, in the order they first appear (as type_code of
+    AtomTable from build_lattice())."""
+    species = []
+    for fz, atoms in basis:
+        for atom in atoms:
+            if atom[2] not in species:
+                species.append(atom[2])
+    return species
+
+
+def count_lattice(entry,
+                  num_x_cell,
+                  num_y_cell,
+                  num_z_cell,
+                  xyz_bound,
+                  lattice,
+                  k_start=0):
+    """Number of atoms build_lattice() creates, without building them.
+
+    The z_hi clipping uses the same expression as build_lattice(), so the
+    count is exact.
+
+    # Arguments
+        entry: entry of a structure in STRUCTURES
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure
+        k_start: index of first z cell, default = 0
+
+    # Return
+        number of atoms
+
+    # Date
+        20261018
+    """
+    z_lo = xyz_bound[4]
+    z_hi = xyz_bound[5]
+    z_cell = lattice*entry['cell'][2]
+
+    fz = np.array([layer[0] for layer in entry['basis']], dtype=float)
+    num_layer = np.array([len(layer[1]) for layer in entry['basis']])
+    k = np.arange(k_start, k_start + num_z_cell)
+    z = z_lo + (k[:, np.newaxis] + fz[np.newaxis, :])*z_cell
+    num_atom = np.sum(np.where(z > z_hi, 0, num_layer[np.newaxis, :]))
+    return int(num_atom) * num_x_cell * num_y_cell
+
+
+def cached_lattice(entry,
+                   num_x_cell,
+                   num_y_cell,
+                   num_z_cell,
+                   xyz_bound,
+                   lattice,
+                   k_start=0,
+                   id_start=1,
+                   out=None,
+                   cache=None,
+                   evict=True):
+    """Same as build_lattice() for an entry of STRUCTURES, using a cache.
+
+    The key is a hash of LATTICE_VERSION, basis and cell of the entry (so
+    aliases share cache files), lattice, number of cells, k_start and
+    xyz_bound.  Atom ids are not part of the key.
+
+    # Arguments
+        entry: entry of a structure in STRUCTURES
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure
+        k_start: index of first z cell, default = 0
+        id_start: atom id of first atom, default = 1
+        out: AtomTable to be filled in place, see build_lattice()
+        cache: cache_utils.LatticeCache, default = None (no cache)
+        evict: remove least recently used files after saving, default =
+            True
+
+    # Return
+        AtomTable of atoms
+
+    # Date
+        20261018
+    """
+    if cache is None:
+        return build_lattice(entry['basis'],
+                             num_x_cell,
+                             num_y_cell,
+                             num_z_cell,
+                             xyz_bound,
+                             lattice,
+                             cell=entry['cell'],
+                             k_start=k_start,
+                             id_start=id_start,
+                             out=out)
+
+    key = cache_utils.make_key(LATTICE_VERSION,
+                               entry['basis'],
+                               entry['cell'],
+                               lattice,
+                               num_x_cell,
+                               num_y_cell,
+                               num_z_cell,
+                               k_start,
+                               xyz_bound)
+    table = cache.load(key, id_start=id_start, out=out)
+    if table is None:
+        table = build_lattice(entry['basis'],
+                              num_x_cell,
+                              num_y_cell,
+                              num_z_cell,
+                              xyz_bound,
+                              lattice,
+                              cell=entry['cell'],
+                              k_start=k_start,
+                              id_start=id_start,
+                              out=out)
+        cache.save(key, table, evict=evict)
+    return table
+
+
+def iter_lattice(structure,
+                 num_x_cell,
+                 num_y_cell,
+                 num_z_cell,
+                 xyz_bound,
+                 lattice=None,
+                 chunk_size=1000000,
+                 id_start=1,
+                 cache=None):
+    """Generate coordinate of a structure in STRUCTURES slab by slab in z.
+
+    Each chunk holds a whole number of z cells and about chunk_size atoms
+    (at least one z cell), so memory is set by chunk_size instead of the
+    total number of atoms.  Joining all chunks gives the same atoms, in
+    the same order, as create_lattice().
+
+    # Arguments
+        structure: name of structure (or an alias)
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure, default is the one in
+            STRUCTURES
+        chunk_size: number of atoms in each chunk (approximately)
+        id_start: atom id of first atom, ids are consecutive across chunks
+        cache: cache_utils.LatticeCache, chunks are loaded from it if they
+            were built before, default = None (no cache)
+
+    # Return
+        generator of AtomTable for each chunk
+
+    # Example
+        for table in iter_lattice(
+                'si_001', 100, 100, 1000, xyz_bound, chunk_size=10**6):
+            ...
+
+    # Date
+        20261018
+    """
+    entry, lattice = lookup_lattice(structure, lattice)
+
+    for k_start, num_k in z_slabs(entry, num_x_cell, num_y_cell,
+                                  num_z_cell, chunk_size):
+        chunk = cached_lattice(entry,
+                               num_x_cell,
+                               num_y_cell,
+                               num_k,
+                               xyz_bound,
+                               lattice,
+                               k_start=k_start,
+                               id_start=id_start,
+                               cache=cache)
+        # the rest of cells are above z_hi
+        if len(chunk) == 0:
+            return
+        id_start = chunk.atom_id[-1] + 1
+        yield chunk
+
+
+def create_lattice(structure,
+                   num_x_cell,
+                   num_y_cell,
+                   num_z_cell,
+                   xyz_bound,
+                   lattice=None):
+    """Generate coordinate of a structure in STRUCTURES.
+
+    # Arguments
+        structure: name of structure (or an alias)
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure, default is the one in
+            STRUCTURES
+
+    # Return
+        AtomTable of atoms, use AtomTable.as_tuple() to get arrays of
+        atom_id, atom_type, x, y, z.  The number of atoms is counted first
+        (count_lattice()), so the columns are allocated once.
+
+    # Example
+        table = create_lattice(
+            'c_diamond', 4, 4, 4, [0.0, 14.28, 0.0, 14.28, 0.0, 14.28])
+
+    # Date
+        20261018
+    """
+    entry, lattice = lookup_lattice(structure, lattice)
+
+    num_atom = count_lattice(entry, num_x_cell, num_y_cell, num_z_cell,
+                             xyz_bound, lattice)
+    table = atom_utils.AtomTable.empty(num_atom,
+                                       basis_species(entry['basis']))
+    return build_lattice(entry['basis'],
+                         num_x_cell,
+                         num_y_cell,
+                         num_z_cell,
+                         xyz_bound,
+                         lattice,
+                         cell=entry['cell'],
+                         out=table)
+
+
+def predict_lattice(structure,
+                    num_x_cell,
+                    num_y_cell,
+                    num_z_cell,
+                    xyz_bound,
+                    lattice=None,
+                    chunk_size=1000000):
+    """Predict atoms of a structure in STRUCTURES without building it.
+
+    # Arguments
+        structure: name of structure (or an alias)
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure, default is the one in
+            STRUCTURES
+        chunk_size: number of atoms in each chunk (approximately), the same
+            as iter_lattice()
+
+    # Return
+        dictionary of
+            num_atom: number of atoms (before any deletion)
+            num_chunk: number of chunks iter_lattice() yields
+            chunk_atom: number of atoms of the largest chunk
+            sample: AtomTable of atoms in corner cells (at most 2 cells in
+                x, y and z from each end), their coordinates have as many
+                digits as any atom, and only a few cells are built
+
+    # Date
+        20261018
+    """
+    entry, lattice = lookup_lattice(structure, lattice)
+
+    num_atom = 0
+    num_chunk = 0
+    chunk_atom = 0
+    for k_start, num_k in z_slabs(entry, num_x_cell, num_y_cell,
+                                  num_z_cell, chunk_size):
+        count = count_lattice(entry, num_x_cell, num_y_cell, num_k,
+                              xyz_bound, lattice, k_start=k_start)
+        if count == 0:
+            break
+        num_atom = num_atom + count
+        num_chunk = num_chunk + 1
+        chunk_atom = max(chunk_atom, count)
+
+    # 2 cells at each end in x and y, 1 in z, instead of whole z layers
+    def ends(num_cell):
+        num_sample = min(2, num_cell)
+        return num_sample, sorted(set([0, num_cell - num_sample]))
+
+    num_x_sample, i_list = ends(num_x_cell)
+    num_y_sample, j_list = ends(num_y_cell)
+    sample = [build_lattice(entry['basis'], num_x_sample, num_y_sample, 1,
+                            xyz_bound, lattice, cell=entry['cell'],
+                            k_start=k_start, i_start=i_start,
+                            j_start=j_start)
+              for k_start in sorted(set([0, max(0, num_z_cell - 1)]))
+              for j_start in j_list
+              for i_start in i_list]
+
+    return {'num_atom': num_atom,
+            'num_chunk': num_chunk,
+            'chunk_atom': chunk_atom,
+            'sample': atom_utils.AtomTable.concatenate(sample)}
+
+
+def si_001(num_x_cell,
+           num_y_cell,
+           num_z_cell,
+           xyz_bound,
+           lattice=5.431):
+    """Generate coordinate of si 001 structure.
+
+    # Arguments
+        lattice: lattice constant of this structure, default = 5.431 A
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+
+    # Return
+        AtomTable of atoms, use AtomTable.as_tuple() to get arrays of
+        atom_id, atom_type, x, y, z
+
+    # Example
+
+    # Date
+        20190821
+    """
+    return create_lattice('si_001',
+                          num_x_cell,
+                          num_y_cell,
+                          num_z_cell,
+                          xyz_bound,
+                          lattice=lattice)
+
+
 def sio2_beta_Cristobalite(num_x_cell,
                            num_y_cell,
                            num_z_cell,
@@ -171,256 +736,20 @@ def sio2_beta_Cristobalite(num_x_cell,
         xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
 
     # Return
-        array of
-        x : coordinate in x direction
-        y :               y
-        z :               z
-        atom_id : atom id of each atom
-        atom_type : type of each atom
+        AtomTable of atoms, use AtomTable.as_tuple() to get arrays of
+        atom_id, atom_type, x, y, z
 
     # Example
 
     # Date
         20190821
     """
-    # warning if lattice constant is different from default value
-    lattice_default = 7.126
-    if abs(lattice - lattice_default) > 1.e-6:
-        print('Warning:')
-        print('Different lattice constant {} from default {} for sio2_beta.'.
-              format(lattice, lattice_default))
-
-    # lower and upper bound of this structure
-    x_lo = xyz_bound[0]
-    x_hi = xyz_bound[1]
-    y_lo = xyz_bound[2]
-    y_hi = xyz_bound[3]
-    z_lo = xyz_bound[4]
-    z_hi = xyz_bound[5]
-
-    atom_id = []
-    atom_type = []
-    x = []
-    y = []
-    z = []
-    Ncount = 0
-
-    for k in np.arange(num_z_cell):  # z direction
-        for m in [1, 2, 3, 4, 5, 6, 7, 8]:
-            for j in np.arange(num_y_cell):  # y direction
-                for i in np.arange(num_x_cell):  # x direction
-                    # print(k,m,j,i)
-
-                    if m == 1:
-                        if z_lo + k*lattice > z_hi:
-                            continue
-
-                        # Si atom in the origin of cubic unit cell
-                        x.append(x_lo + i*lattice)
-                        y.append(y_lo + j*lattice)
-                        z.append(z_lo + k*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        # Si atom on face
-                        x.append(x_lo + (i+0.5)*lattice)
-                        y.append(y_lo + (j+0.5)*lattice)
-                        z.append(z_lo + k*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 2:
-                        if z_lo + (k+0.125)*lattice > z_hi:
-                            continue
-
-                        # O atoms
-                        x.append(x_lo + (i+0.125)*lattice)
-                        y.append(y_lo + (j+0.125)*lattice)
-                        z.append(z_lo + (k+0.125)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.375)*lattice)
-                        y.append(y_lo + (j+0.375)*lattice)
-                        z.append(z_lo + (k+0.125)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.625)*lattice)
-                        y.append(y_lo + (j+0.625)*lattice)
-                        z.append(z_lo + (k+0.125)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.875)*lattice)
-                        y.append(y_lo + (j+0.875)*lattice)
-                        z.append(z_lo + (k+0.125)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                    if m == 3:
-                        if z_lo + (k+0.25)*lattice > z_hi:
-                            continue
-
-                        # Si atom in cell
-                        x.append(x_lo + (i+0.25)*lattice)
-                        y.append(y_lo + (j+0.25)*lattice)
-                        z.append(z_lo + (k+0.25)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + (i+0.75)*lattice)
-                        y.append(y_lo + (j+0.75)*lattice)
-                        z.append(z_lo + (k+0.25)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 4:
-                        if z_lo + (k+0.375)*lattice > z_hi:
-                            continue
-
-                        # O atoms
-                        x.append(x_lo + (i+0.125)*lattice)
-                        y.append(y_lo + (j+0.375)*lattice)
-                        z.append(z_lo + (k+0.375)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.375)*lattice)
-                        y.append(y_lo + (j+0.125)*lattice)
-                        z.append(z_lo + (k+0.375)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.625)*lattice)
-                        y.append(y_lo + (j+0.875)*lattice)
-                        z.append(z_lo + (k+0.375)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.875)*lattice)
-                        y.append(y_lo + (j+0.625)*lattice)
-                        z.append(z_lo + (k+0.375)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                    if m == 5:
-                        if z_lo + (k+0.5)*lattice > z_hi:
-                            continue
-
-                        # Si atom on face
-                        x.append(x_lo + (i+0.5)*lattice)
-                        y.append(y_lo + j*lattice)
-                        z.append(z_lo + (k+0.5)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + i*lattice)
-                        y.append(y_lo + (j+0.5)*lattice)
-                        z.append(z_lo + (k+0.5)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 6:
-                        if z_lo + (k+0.625)*lattice > z_hi:
-                            continue
-
-                        # O atoms
-                        x.append(x_lo + (i+0.625)*lattice)
-                        y.append(y_lo + (j+0.125)*lattice)
-                        z.append(z_lo + (k+0.625)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.875)*lattice)
-                        y.append(y_lo + (j+0.375)*lattice)
-                        z.append(z_lo + (k+0.625)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.125)*lattice)
-                        y.append(y_lo + (j+0.625)*lattice)
-                        z.append(z_lo + (k+0.625)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.375)*lattice)
-                        y.append(y_lo + (j+0.875)*lattice)
-                        z.append(z_lo + (k+0.625)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                    if m == 7:
-                        if z_lo + (k+0.75)*lattice > z_hi:
-                            continue
-
-                        # atom in cell
-                        x.append(x_lo + (i+0.75)*lattice)
-                        y.append(y_lo + (j+0.25)*lattice)
-                        z.append(z_lo + (k+0.75)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                        x.append(x_lo + (i+0.25)*lattice)
-                        y.append(y_lo + (j+0.75)*lattice)
-                        z.append(z_lo + (k+0.75)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('Si')
-
-                    if m == 8:
-                        if z_lo + (k+0.875)*lattice > z_hi:
-                            continue
-
-                        # O atoms
-                        x.append(x_lo + (i+0.125)*lattice)
-                        y.append(y_lo + (j+0.875)*lattice)
-                        z.append(z_lo + (k+0.875)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.375)*lattice)
-                        y.append(y_lo + (j+0.625)*lattice)
-                        z.append(z_lo + (k+0.875)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.625)*lattice)
-                        y.append(y_lo + (j+0.375)*lattice)
-                        z.append(z_lo + (k+0.875)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-                        x.append(x_lo + (i+0.875)*lattice)
-                        y.append(y_lo + (j+0.125)*lattice)
-                        z.append(z_lo + (k+0.875)*lattice)
-                        Ncount = Ncount + 1
-                        atom_id.append(Ncount)
-                        atom_type.append('O')
-
-    return atom_id, atom_type, x, y, z
+    return create_lattice('sio2_beta',
+                          num_x_cell,
+                          num_y_cell,
+                          num_z_cell,
+                          xyz_bound,
+                          lattice=lattice)
 
 
 def inside_box(coord, region):
@@ -583,3 +912,958 @@ def inside_sphere(coord, region):
         return True
     else:
         return False
+
+
+def inside_box_mask(coord, region):
+    """Check which points are inside of a box region, in one pass.
+
+    # Arguments
+        coord: an array with shape (N, 3) of coordinates to be checked,
+            each row is [x, y, z], ex: AtomTable.coord
+        region: same as inside_box(), [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi]
+
+    # Return
+        boolean array with shape (N,), True if the point is inside of box
+
+    # Example
+        mask = inside_box_mask(table.coord, [0, 10, 0, 10, 0, 5])
+
+    # Date
+        20261018
+    """
+    coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+    try:
+        x_lo = region[0]
+        x_hi = region[1]
+        y_lo = region[2]
+        y_hi = region[3]
+        z_lo = region[4]
+        z_hi = region[5]
+    except (IndexError) as e:
+        print('IndexError in inside_box_mask() !!')
+        print(e)
+        print('your region: {}'.format(region))
+        print('region should be: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi]')
+        exit()
+
+    x = coord[:, 0]
+    y = coord[:, 1]
+    z = coord[:, 2]
+    return (x >= x_lo) & (x <= x_hi) & \
+           (y >= y_lo) & (y <= y_hi) & \
+           (z >= z_lo) & (z <= z_hi)
+
+
+def inside_cylinder_mask(coord, region):
+    """Check which points are inside of a cylinder region, in one pass.
+
+    # Arguments
+        coord: an array with shape (N, 3) of coordinates to be checked,
+            each row is [x, y, z], ex: AtomTable.coord
+        region: same as inside_cylinder(),
+            [axis, x_lo, y_lo, z_lo, height, radius]
+
+    # Return
+        boolean array with shape (N,), True if the point is inside of
+        cylinder
+
+    # Example
+        mask = inside_cylinder_mask(table.coord, ['z', 20, 30, 0, 1000, 20])
+
+    # Date
+        20261018
+    """
+    coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+    try:
+        axis = region[0].lower().strip()
+        x_lo = region[1]
+        y_lo = region[2]
+        z_lo = region[3]
+        height = region[4]
+        radius = region[5]
+    except (IndexError) as e:
+        print('IndexError in inside_cylinder_mask() !!')
+        print(e)
+        print('your region: {}'.format(region))
+        print('region should be: [axis, x_lo, y_lo, z_lo, height, radius]')
+        exit()
+
+    # (index of axis, index of two other dimensions, lowest point of axis)
+    if (axis == 'z'):
+        a, b, c, lo, b0, c0 = 2, 0, 1, z_lo, x_lo, y_lo
+    elif (axis == 'x'):
+        a, b, c, lo, b0, c0 = 0, 1, 2, x_lo, y_lo, z_lo
+    elif (axis == 'y'):
+        a, b, c, lo, b0, c0 = 1, 0, 2, y_lo, x_lo, z_lo
+    else:
+        print('Unknow axis: {}, script exits'.format(axis))
+        exit()
+
+    h = coord[:, a]
+    d2 = (coord[:, b] - b0)**2 + (coord[:, c] - c0)**2
+    return (h >= lo) & (h <= lo + height) & (d2 <= radius**2)
+
+
+def inside_sphere_mask(coord, region):
+    """Check which points are inside of a spherical region, in one pass.
+
+    # Arguments
+        coord: an array with shape (N, 3) of coordinates to be checked,
+            each row is [x, y, z], ex: AtomTable.coord
+        region: same as inside_sphere(), [cx, cy, cz, radius]
+
+    # Return
+        boolean array with shape (N,), True if the point is inside of
+        sphere
+
+    # Example
+        mask = inside_sphere_mask(table.coord, [10, 10, 10, 5])
+
+    # Date
+        20261018
+    """
+    coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+    try:
+        cx = region[0]
+        cy = region[1]
+        cz = region[2]
+        radius = region[3]
+    except (IndexError) as e:
+        print('IndexError in inside_sphere_mask() !!')
+        print(e)
+        print('your region: {}'.format(region))
+        print('region should be: [cx, cy, cz, radius]')
+        exit()
+
+    d2 = (coord[:, 0] - cx)**2 + (coord[:, 1] - cy)**2 + \
+         (coord[:, 2] - cz)**2
+    return d2 <= radius**2
+
+
+# regions available for delete_mask(), name: function returning a mask
+REGIONS = {
+    'box': inside_box_mask,
+    'cylinder': inside_cylinder_mask,
+    'sphere': inside_sphere_mask,
+    }
+
+# parameters of each region in REGIONS
+REGION_PARAMETERS = {
+    'box': ['x_lo', 'x_hi', 'y_lo', 'y_hi', 'z_lo', 'z_hi'],
+    'cylinder': ['axis', 'x_lo', 'y_lo', 'z_lo', 'height', 'radius'],
+    'sphere': ['cx', 'cy', 'cz', 'radius'],
+    }
+
+
+def check_region(reg, par):
+    """Check parameters of a box, cylinder or sphere region before atoms
+    are built, the mask functions exit on them otherwise.
+
+    # Arguments
+        reg: name of region in REGIONS, box, cylinder or sphere
+        par: parameters of region, see inside_box(), inside_cylinder() and
+            inside_sphere()
+
+    # Return
+        None, ValueError is raised if parameters are invalid
+
+    # Example
+        check_region('cylinder', ['z', 25, 25, 0, 40, 10])
+
+    # Date
+        20261018
+    """
+    if reg not in REGION_PARAMETERS:
+        raise ValueError('unknown region {}, available regions are '
+                         '{}'.format(reg, sorted(REGION_PARAMETERS)))
+    names = REGION_PARAMETERS[reg]
+    if len(par) != len(names):
+        raise ValueError('{} needs {} parameters [{}], {} are given: '
+                         '{}'.format(reg, len(names), ', '.join(names),
+                                     len(par), par))
+    values = par
+    if reg == 'cylinder':
+        if str(par[0]).lower().strip() not in ('x', 'y', 'z'):
+            raise ValueError('axis of cylinder needs to be x, y or z, not '
+                             '{}'.format(par[0]))
+        values = par[1:]
+    try:
+        [float(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError('parameters of {} need to be numbers: '
+                         '{}'.format(reg, par))
+
+
+def delete_mask(coord, delete_list, cells=None):
+    """Apply delete regions in order and get atoms to be kept.
+
+    For each delete region, atoms still kept are first culled against its
+    container box, then the region is only checked for atoms inside the
+    container.  in=1 removes atoms inside the region, in=0 removes atoms
+    outside the region (both only inside the container).
+
+    # Arguments
+        coord: an array with shape (N, 3) of coordinates, ex: AtomTable.coord
+        delete_list: list of delete regions, each is [con, reg, par, in]
+            con: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of container
+            reg: name of region in REGIONS, box, cylinder or sphere, or a
+                Region (see make_region()), par is not used for a Region
+            par: parameters of region, see inside_box(), inside_cylinder()
+                and inside_sphere()
+            in: 1 or 0
+        cells: a cell_utils.CellList built over coord, if given, only atoms
+            in cells that intersect a container are checked, default = None
+
+    # Return
+        boolean array with shape (N,), True if the atom is kept
+
+    # Example
+        keep = delete_mask(table.coord,
+                           [[[0, 50, 0, 50, 10, 30], 'sphere',
+                             [25, 25, 20, 5], 1]])
+        table = table[keep]
+
+    # Date
+        20261018
+    """
+    coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+    keep = np.ones(len(coord), dtype=bool)
+
+    for con, reg, par, inside in delete_list:
+        # candidates: atoms kept so far and inside container
+        if cells is None:
+            cand = np.flatnonzero(keep)
+        else:
+            cand = cells.candidates(con)
+            cand = cand[keep[cand]]
+        cand = cand[inside_box_mask(coord[cand], con)]
+        if len(cand) == 0:
+            continue
+
+        if isinstance(reg, Region):
+            in_region = reg.mask(coord[cand])
+        else:
+            in_region = REGIONS[reg](coord[cand], par)
+        if inside:
+            keep[cand[in_region]] = False
+        else:
+            keep[cand[~in_region]] = False
+
+    return keep
+
+
+# a cell list is built over a chunk if there are at least this number of
+# delete regions, so that each region only checks atoms near its container
+CELL_LIST_MIN_REGIONS = 8
+
+
+def delete_atoms(table, delete_list, box, cell_size):
+    """Delete atoms of a chunk with delete regions in order.
+
+    A cell list is built over the chunk when there are at least
+    CELL_LIST_MIN_REGIONS regions, see delete_mask().
+
+    # Arguments
+        table: AtomTable of the chunk
+        delete_list: list of delete regions, see delete_mask()
+        box: [x_lo, x_hi, y_lo, y_hi] of simulation box
+        cell_size: size of cells of the cell list (in Angstrum)
+
+    # Return
+        AtomTable of atoms to be kept
+
+    # Date
+        20261018
+    """
+    if not delete_list or len(table) == 0:
+        return table
+    if len(delete_list) >= CELL_LIST_MIN_REGIONS:
+        cells = cell_utils.CellList(
+            table.coord,
+            [box[0], box[1], box[2], box[3],
+             np.min(table.z), np.max(table.z)],
+            cell_size)
+        return table[delete_mask(table.coord, delete_list, cells=cells)]
+    return table[delete_mask(table.coord, delete_list)]
+
+
+def region_bound(reg, par):
+    """Axis-aligned bounding box of a box, cylinder or sphere region.
+
+    # Arguments
+        reg: name of region, box, cylinder or sphere
+        par: parameters of region, see inside_box(), inside_cylinder() and
+            inside_sphere()
+
+    # Return
+        [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi]
+
+    # Date
+        20261018
+    """
+    if reg == 'box':
+        return [float(v) for v in par[:6]]
+    elif reg == 'cylinder':
+        axis = par[0].lower().strip()
+        x_lo, y_lo, z_lo, height, radius = [float(v) for v in par[1:6]]
+        if axis == 'z':
+            return [x_lo - radius, x_lo + radius,
+                    y_lo - radius, y_lo + radius,
+                    z_lo, z_lo + height]
+        elif axis == 'x':
+            return [x_lo, x_lo + height,
+                    y_lo - radius, y_lo + radius,
+                    z_lo - radius, z_lo + radius]
+        elif axis == 'y':
+            return [x_lo - radius, x_lo + radius,
+                    y_lo, y_lo + height,
+                    z_lo - radius, z_lo + radius]
+        else:
+            print('Unknow axis: {}, script exits'.format(axis))
+            exit()
+    elif reg == 'sphere':
+        cx, cy, cz, radius = [float(v) for v in par[:4]]
+        return [cx - radius, cx + radius,
+                cy - radius, cy + radius,
+                cz - radius, cz + radius]
+    else:
+        print('Unknow region: {}, script exits'.format(reg))
+        exit()
+
+
+# bound of a region without limit
+INFINITE_BOUND = [-np.inf, np.inf, -np.inf, np.inf, -np.inf, np.inf]
+
+
+class Region:
+    """Region that can be combined with other regions (constructive solid
+    geometry).
+
+    Regions are combined with operators:
+        a | b : union
+        a & b : intersection
+        a - b : difference (in a and not in b)
+        ~a    : complement
+    Every region carries an axis-aligned bounding box (bound).  mask()
+    only tests the region for points inside the bounding box, and each
+    sub-region only tests points that are left by its parent, so a deep
+    composition is still evaluated in one pass over the points.
+
+    # Argument
+        bound: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] that contains the region
+
+    # Example
+        hole = (make_region('cylinder', ['z', 25, 25, 0, 40, 10])
+                - make_region('sphere', [25, 25, 40, 6])
+                | make_region('box', [0, 50, 0, 50, 45, 50]))
+        table = table[~hole.mask(table.coord)]
+
+    # Date
+        20261018
+    """
+
+    def __init__(self, bound):
+        self.bound = [float(v) for v in bound]
+
+    def mask(self, coord):
+        """Check which points are inside of this region.
+
+        # Arguments
+            coord: an array with shape (N, 3) of coordinates
+
+        # Return
+            boolean array with shape (N,), True if the point is inside
+        """
+        coord = np.asarray(coord, dtype=float).reshape(-1, 3)
+        mask = np.zeros(len(coord), dtype=bool)
+        if self.is_empty():
+            return mask
+        cand = np.flatnonzero(inside_box_mask(coord, self.bound))
+        if len(cand) > 0:
+            mask[cand] = self.mask_in_bound(coord[cand])
+        return mask
+
+    def mask_in_bound(self, coord):
+        """Same as mask(), for points that are inside of bound."""
+        raise NotImplementedError
+
+    def is_empty(self):
+        """True if the bounding box has no volume."""
+        b = self.bound
+        return b[0] > b[1] or b[2] > b[3] or b[4] > b[5]
+
+    def __or__(self, other):
+        return UnionRegion(self, other)
+
+    def __and__(self, other):
+        return IntersectionRegion(self, other)
+
+    def __sub__(self, other):
+        return DifferenceRegion(self, other)
+
+    def __invert__(self):
+        return ComplementRegion(self)
+
+
+class PrimitiveRegion(Region):
+    """box, cylinder or sphere region, see make_region()."""
+
+    def __init__(self, reg, par):
+        self.reg = reg
+        self.par = par
+        Region.__init__(self, region_bound(reg, par))
+
+    def mask_in_bound(self, coord):
+        return REGIONS[self.reg](coord, self.par)
+
+    def __repr__(self):
+        return '{}({})'.format(self.reg, self.par)
+
+
+class UnionRegion(Region):
+    """Points in region a or in region b."""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        Region.__init__(self, [min(a.bound[0], b.bound[0]),
+                               max(a.bound[1], b.bound[1]),
+                               min(a.bound[2], b.bound[2]),
+                               max(a.bound[3], b.bound[3]),
+                               min(a.bound[4], b.bound[4]),
+                               max(a.bound[5], b.bound[5])])
+
+    def mask_in_bound(self, coord):
+        # only test b for points that are not in a
+        mask = self.a.mask(coord)
+        rest = np.flatnonzero(~mask)
+        mask[rest] = self.b.mask(coord[rest])
+        return mask
+
+    def __repr__(self):
+        return '({!r} | {!r})'.format(self.a, self.b)
+
+
+class IntersectionRegion(Region):
+    """Points in region a and in region b."""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        Region.__init__(self, [max(a.bound[0], b.bound[0]),
+                               min(a.bound[1], b.bound[1]),
+                               max(a.bound[2], b.bound[2]),
+                               min(a.bound[3], b.bound[3]),
+                               max(a.bound[4], b.bound[4]),
+                               min(a.bound[5], b.bound[5])])
+
+    def mask_in_bound(self, coord):
+        # only test b for points that are in a
+        mask = self.a.mask(coord)
+        cand = np.flatnonzero(mask)
+        mask[cand] = self.b.mask(coord[cand])
+        return mask
+
+    def __repr__(self):
+        return '({!r} & {!r})'.format(self.a, self.b)
+
+
+class DifferenceRegion(Region):
+    """Points in region a and not in region b."""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        Region.__init__(self, a.bound)
+
+    def mask_in_bound(self, coord):
+        # only test b for points that are in a
+        mask = self.a.mask(coord)
+        cand = np.flatnonzero(mask)
+        mask[cand] = ~self.b.mask(coord[cand])
+        return mask
+
+    def __repr__(self):
+        return '({!r} - {!r})'.format(self.a, self.b)
+
+
+class ComplementRegion(Region):
+    """Points not in region a."""
+
+    def __init__(self, a):
+        self.a = a
+        Region.__init__(self, INFINITE_BOUND)
+
+    def mask_in_bound(self, coord):
+        return ~self.a.mask(coord)
+
+    def __repr__(self):
+        return '~{!r}'.format(self.a)
+
+
+def make_region(reg, par):
+    """Create a box, cylinder or sphere Region that can be combined.
+
+    # Arguments
+        reg: name of region in REGIONS, box, cylinder or sphere
+        par: parameters of region, see inside_box(), inside_cylinder() and
+            inside_sphere()
+
+    # Return
+        PrimitiveRegion
+
+    # Example
+        via = make_region('cylinder', ['z', 25, 25, 0, 40, 10])
+
+    # Date
+        20261018
+    """
+    reg = reg.lower().strip()
+    if reg not in REGIONS:
+        print('Unknow region: {}, script exits'.format(reg))
+        print('available regions: {}'.format(sorted(REGIONS)))
+        exit()
+    return PrimitiveRegion(reg, par)
+
+
+def pair_cutoff_matrix(species_a, species_b, cutoff, pair_cutoff=None):
+    """Cutoff of each pair of species.
+
+    # Arguments
+        species_a: list of species names
+        species_b: list of species names
+        cutoff: default cutoff (in Angstrum)
+        pair_cutoff: dictionary of cutoff of species pairs, key is
+            (sp_1, sp_2) or 'sp_1-sp_2', the order of species doesn't matter,
+            ex: {('Si', 'O'): 1.4, 'Si-Si': 2.0}
+
+    # Return
+        array with shape (len(species_a), len(species_b))
+
+    # Date
+        20261018
+    """
+    pairs = {}
+    for key, value in (pair_cutoff or {}).items():
+        if isinstance(key, str):
+            key = key.split('-')
+        sp_1, sp_2 = key
+        pairs[sp_1, sp_2] = float(value)
+        pairs[sp_2, sp_1] = float(value)
+
+    matrix = np.full((len(species_a), len(species_b)), float(cutoff))
+    for ia, sp_a in enumerate(species_a):
+        for ib, sp_b in enumerate(species_b):
+            if (sp_a, sp_b) in pairs:
+                matrix[ia, ib] = pairs[sp_a, sp_b]
+    return matrix
+
+
+def clean_interfaces(chunks,
+                     z_interface,
+                     box,
+                     window,
+                     cutoff,
+                     pair_cutoff=None,
+                     mode='remove',
+                     report=None):
+    """Remove atoms that are too close to atoms of the structure below.
+
+    chunks come from stacked structures, in order, each chunk ordered by z
+    (as from iter_lattice()).  Atoms of a structure within window below
+    the start of the next structure are held back, and atoms at the bottom
+    of the next structure are checked against them with a cell list, so
+    the cost scales with the interface area instead of the volume.  Each
+    structure is only checked against the structure right below it.
+
+    mode = 'remove': atoms of the upper structure closer than cutoff to an
+                     atom of the lower structure are removed
+           'merge' : same as 'remove', and the lower atom is moved to the
+                     midpoint of the pair (an atom is merged at most once,
+                     distances are always checked with positions before
+                     merging, so the result doesn't depend on chunks)
+
+    # Arguments
+        chunks: iterable of (index of structure, AtomTable)
+        z_interface: list of z_lo of each structure, interface of structure
+            s (s > 0) is at z_interface[s]
+        box: [x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of simulation box,
+            x and y are periodic
+        window: atoms of the lower structure with z >= z_interface - window
+            are checked (in Angstrum), needs to be >= cutoff
+        cutoff: default minimum distance between atoms (in Angstrum)
+        pair_cutoff: cutoff of species pairs, see pair_cutoff_matrix()
+        mode: 'remove' or 'merge'
+        report: dictionary, number of removed and merged atoms are added to
+            report['removed'] and report['merged'] if given
+
+    # Return
+        generator of AtomTable, in the same order as chunks
+
+    # Example
+        for table in clean_interfaces(chunks, [0.0, 54.31], box, 3.0, 1.2,
+                                      pair_cutoff={'Si-O': 1.4}):
+            ...
+
+    # Date
+        20261018
+    """
+    if mode not in ('remove', 'merge'):
+        print('Unknow mode of clean_interfaces: {}, script exits'.format(mode))
+        exit()
+    if report is None:
+        report = {}
+    report.setdefault('removed', 0)
+    report.setdefault('merged', 0)
+
+    cut_max = max([float(cutoff)] +
+                  [float(v) for v in (pair_cutoff or {}).values()])
+
+    def split_tail(table, s):
+        """Split atoms to be written and atoms held for next interface."""
+        if s + 1 < len(z_interface) and len(table) > 0:
+            tail = table.z >= z_interface[s + 1] - window
+            if np.any(tail):
+                return table[~tail], table[tail]
+        return table, None
+
+    state = {'current': None, 'pending': None, 'held': [], 'next': [],
+             'cells': None, 'merged': None, 'matrix': {}}
+
+    def release():
+        """Tables to be written when the interface check is done."""
+        out = []
+        if state['pending'] is not None and len(state['pending']) > 0:
+            out.append(state['pending'])
+        for table in state['held']:
+            emit, tail = split_tail(table, state['current'])
+            out.append(emit)
+            if tail is not None:
+                state['next'].append(tail)
+        state['pending'] = None
+        state['held'] = []
+        state['cells'] = None
+        return out
+
+    def check(table):
+        """Remove (or merge) atoms of table close to pending atoms."""
+        pending = state['pending']
+        near = np.flatnonzero(table.z <= np.max(pending.z) + cut_max)
+        if len(near) == 0:
+            return table
+        i, j, d = state['cells'].pairs(cut_max, other=table.coord[near])
+        key = tuple(table.species)
+        if key not in state['matrix']:
+            state['matrix'][key] = pair_cutoff_matrix(table.species,
+                                                      pending.species,
+                                                      cutoff, pair_cutoff)
+        close = d < state['matrix'][key][table.type_code[near[i]],
+                                         pending.type_code[j]]
+        i, j, d = i[close], j[close], d[close]
+        if len(i) == 0:
+            return table
+        remove_i = np.unique(i)
+
+        if mode == 'merge':
+            # nearest pending atom of each removed atom, merged once
+            order = np.lexsort((d, i))
+            i, j = i[order], j[order]
+            first = np.concatenate([[True], i[1:] != i[:-1]])
+            i, j = i[first], j[first]
+            j, index = np.unique(j, return_index=True)
+            i = i[index]
+            free = ~state['merged'][j]
+            i, j = i[free], j[free]
+            shift = state['cells'].minimum_image(
+                table.coord[near[i]] - pending.coord[j])
+            pending.pos[:, j] = pending.pos[:, j] + 0.5*shift.T
+            state['merged'][j] = True
+            report['merged'] = report['merged'] + len(j)
+
+        remove = np.zeros(len(table), dtype=bool)
+        remove[near[remove_i]] = True
+        report['removed'] = report['removed'] + int(np.sum(remove))
+        return table[~remove]
+
+    for s, table in chunks:
+        if s != state['current']:
+            # finish previous structure
+            for out in release():
+                yield out
+            state['current'] = s
+            if s > 0 and state['next']:
+                pending = atom_utils.AtomTable.concatenate(state['next'])
+                state['pending'] = pending
+                # a copy, so merged atoms don't change later checks
+                state['cells'] = cell_utils.CellList(
+                    pending.coord.copy(),
+                    [box[0], box[1], box[2], box[3],
+                     np.min(pending.z), np.max(pending.z)],
+                    cut_max)
+                state['merged'] = np.zeros(len(pending), dtype=bool)
+                state['matrix'] = {}
+            else:
+                for table_next in state['next']:
+                    yield table_next
+            state['next'] = []
+
+        if state['cells'] is not None:
+            table = check(table)
+            state['held'].append(table)
+            # no atom of this structure above this chunk can be close
+            if len(table) > 0 and \
+                    np.max(table.z) > np.max(state['pending'].z) + cut_max:
+                for out in release():
+                    yield out
+            continue
+
+        emit, tail = split_tail(table, s)
+        if tail is not None:
+            state['next'].append(tail)
+        yield emit
+
+    for out in release():
+        yield out
+    for table_next in state['next']:
+        yield table_next
+
+
+def attach_shared_memory(name):
+    """Attach shared memory created by another process.
+
+    The creating process unlinks it, so it is not tracked here (before
+    python 3.13, the resource tracker would unlink it when a worker exits).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def fill_slab(task):
+    """Build and filter one z slab in a worker process, see build_slab().
+
+    Any error of the slab, including exit() of a mask function, is raised
+    as RuntimeError, which pool.map() passes to the parent process; a
+    worker killed by SystemExit would leave pool.map() waiting forever.
+
+    # Arguments
+        task: see build_slab()
+
+    # Return
+        [number of atoms kept in this slab, cache hits, cache misses]
+
+    # Date
+        20261018
+    """
+    try:
+        return build_slab(task)
+    except BaseException as e:
+        raise RuntimeError('building slab from z cell {} failed: '
+                           '{!r}'.format(task[10], e)) from None
+
+
+def build_slab(task):
+    """Build and filter one z slab.
+
+    Atoms are written into shared memory buffers at the offset of the slab,
+    so they are never pickled back to the parent process.
+
+    # Arguments
+        task: [names of shared memory of (atom_id, type_code, pos),
+               capacity of buffers, offset of this slab,
+               number of atoms of this slab before filtering,
+               entry, num_x_cell, num_y_cell, num_z_cell, xyz_bound,
+               lattice, k_start, id_start, delete_list, box, cache]
+
+    # Return
+        [number of atoms kept in this slab, cache hits, cache misses]
+
+    # Date
+        20261018
+    """
+    [names, capacity, offset, count,
+     entry, num_x_cell, num_y_cell, num_z_cell, xyz_bound,
+     lattice, k_start, id_start, delete_list, box, cache] = task
+
+    # the cache is a copy of the one in the parent process, with its counts
+    if cache is not None:
+        hits = cache.hits
+        misses = cache.misses
+
+    shm = [attach_shared_memory(name) for name in names]
+    try:
+        atom_id = np.ndarray(capacity, dtype=np.int64, buffer=shm[0].buf)
+        type_code = np.ndarray(capacity, dtype=np.uint8, buffer=shm[1].buf)
+        pos = np.ndarray((3, capacity), dtype=np.float64, buffer=shm[2].buf)
+
+        # build the slab in place, then move kept atoms to its front
+        slab = atom_utils.AtomTable.from_pos(
+            atom_id[offset:offset + count],
+            type_code[offset:offset + count],
+            pos[:, offset:offset + count],
+            basis_species(entry['basis']))
+        # the parent process removes old cache files after each batch
+        cached_lattice(entry,
+                       num_x_cell,
+                       num_y_cell,
+                       num_z_cell,
+                       xyz_bound,
+                       lattice,
+                       k_start=k_start,
+                       id_start=id_start,
+                       out=slab,
+                       cache=cache,
+                       evict=False)
+        table = delete_atoms(slab, delete_list, box, lattice)
+        num_atom = len(table)
+        if table is not slab:
+            slab.atom_id[:num_atom] = table.atom_id
+            slab.type_code[:num_atom] = table.type_code
+            slab.pos[:, :num_atom] = table.pos
+        del atom_id, type_code, pos, slab, table
+    finally:
+        for each in shm:
+            each.close()
+
+    if cache is None:
+        return [num_atom, 0, 0]
+    return [num_atom, cache.hits - hits, cache.misses - misses]
+
+
+def iter_lattice_parallel(pool,
+                          batch_size,
+                          structure,
+                          num_x_cell,
+                          num_y_cell,
+                          num_z_cell,
+                          xyz_bound,
+                          lattice=None,
+                          chunk_size=1000000,
+                          id_start=1,
+                          delete_list=None,
+                          box=None,
+                          report=None,
+                          cache=None):
+    """Same as iter_lattice() followed by delete_atoms(), using a pool.
+
+    The structure is split into the same z slabs as iter_lattice(), and
+    each worker builds and filters one slab.  The number of atoms of each
+    slab before filtering is known (count_lattice()), so atom ids and the
+    offset of each slab in shared memory buffers are precomputed, and the
+    result is identical to the serial one.  Slabs are processed in batches
+    of the pool size, so memory is set by chunk_size times the pool size.
+
+    # Arguments
+        pool: multiprocessing.Pool
+        batch_size: number of slabs processed at a time, use number of
+            processes of the pool
+        structure: name of structure (or an alias)
+        num_x_cell: number of unit cell in x
+        num_y_cell: number of unit cell in y
+        num_z_cell: number of unit cell in z
+        xyz_bound:[x_lo, x_hi, y_lo, y_hi, z_lo, z_hi] of this structure
+        lattice: lattice constant of this structure, default is the one in
+            STRUCTURES
+        chunk_size: number of atoms in each slab (approximately)
+        id_start: atom id of first atom
+        delete_list: list of delete regions, see delete_mask(), ValueError
+            is raised if a region is invalid
+        box: [x_lo, x_hi, y_lo, y_hi] of simulation box, used for cell list
+            of delete_atoms(), default is x, y of xyz_bound
+        report: dictionary, number of atoms created (before filtering) is
+            added to report['created'] if given
+        cache: cache_utils.LatticeCache, workers load slabs from it if they
+            were built before, hits and misses of workers are added to it,
+            default = None (no cache)
+
+    # Return
+        generator of AtomTable for each slab, after filtering
+
+    # Example
+        with multiprocessing.Pool(8) as pool:
+            for table in iter_lattice_parallel(pool, 8, 'si_001', 100,
+                                               100, 1000, xyz_bound):
+                ...
+
+    # Date
+        20261018
+    """
+    entry, lattice = lookup_lattice(structure, lattice)
+    species = basis_species(entry['basis'])
+    if box is None:
+        box = xyz_bound[:4]
+    # regions are checked here, workers can't exit() on them
+    for con, reg, par, inside in delete_list or []:
+        check_region('box', con)
+        if not isinstance(reg, Region):
+            check_region(reg, par)
+    if report is None:
+        report = {}
+    report.setdefault('created', 0)
+
+    # slabs of z cells, their number of atoms and first atom id
+    slabs = []
+    for k_start, num_k in z_slabs(entry, num_x_cell, num_y_cell,
+                                  num_z_cell, chunk_size):
+        count = count_lattice(entry, num_x_cell, num_y_cell, num_k,
+                              xyz_bound, lattice, k_start=k_start)
+        if count == 0:
+            break
+        slabs.append([k_start, num_k, count, id_start])
+        id_start = id_start + count
+    if not slabs:
+        return
+
+    # one batch of slabs is processed at a time
+    batch_size = max(1, int(batch_size))
+    batches = [slabs[i:i + batch_size]
+               for i in range(0, len(slabs), batch_size)]
+    capacity = max(sum(slab[2] for slab in batch) for batch in batches)
+
+    shm = [shared_memory.SharedMemory(create=True, size=max(1, capacity*8)),
+           shared_memory.SharedMemory(create=True, size=max(1, capacity)),
+           shared_memory.SharedMemory(create=True,
+                                      size=max(1, 3*capacity*8))]
+    names = [each.name for each in shm]
+    atom_id = type_code = pos = None
+    try:
+        atom_id = np.ndarray(capacity, dtype=np.int64, buffer=shm[0].buf)
+        type_code = np.ndarray(capacity, dtype=np.uint8, buffer=shm[1].buf)
+        pos = np.ndarray((3, capacity), dtype=np.float64, buffer=shm[2].buf)
+
+        for batch in batches:
+            tasks = []
+            offset = 0
+            for k_start, num_k, count, slab_id in batch:
+                tasks.append([names, capacity, offset, count,
+                              entry, num_x_cell, num_y_cell, num_k,
+                              xyz_bound, lattice,
+                              k_start, slab_id, delete_list, box, cache])
+                offset = offset + count
+            kept = []
+            for num_atom, hits, misses in pool.map(fill_slab, tasks):
+                kept.append(num_atom)
+                if cache is not None:
+                    cache.hits = cache.hits + hits
+                    cache.misses = cache.misses + misses
+            if cache is not None:
+                cache.evict()
+
+            for task, slab, num_atom in zip(tasks, batch, kept):
+                report['created'] = report['created'] + slab[2]
+                offset = task[2]
+                # copy out, buffers are reused by the next batch
+                yield atom_utils.AtomTable.from_pos(
+                    atom_id[offset:offset + num_atom].copy(),
+                    type_code[offset:offset + num_atom].copy(),
+                    pos[:, offset:offset + num_atom].copy(),
+                    species)
+    finally:
+        # views need to be released before closing shared memory
+        atom_id = type_code = pos = None
+        for each in shm:
+            each.close()
+            each.unlink()
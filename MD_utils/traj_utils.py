@@ -0,0 +1,207 @@
+"""Utilities related to trajectories stored as memory-mapped columns."""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    from . import atom_utils
+    from . import io_utils
+except ImportError:
+    import atom_utils
+    import io_utils
+
+# version of the layout of store directories
+STORE_VERSION = 1
+MANIFEST = 'manifest.json'
+
+
+def convert_trajectory(input_file, store_dir):
+    """Convert a lammpstrj (or xyz) trajectory to a directory of columns.
+
+    Every column of all frames is saved in one fixed-dtype .npy file, frame
+    after frame, and manifest.json keeps the frames, columns and species:
+        atom_id.npy: int64 (total number of atoms,)
+        type_code.npy: uint8, species in manifest
+        pos.npy: float64 (3, total number of atoms), x, y, z (or xu, xs
+            converted the same as io_utils.parse_frame())
+        <name>.npy: float64 of other columns of the dump, ex: vx, q
+        frame_start.npy: int64 (number of frames + 1,), atoms of frame i
+            are frame_start[i]:frame_start[i+1]
+        timestep.npy, box.npy: timestep and box bounds of each frame
+    The trajectory is read once frame by frame (io_utils.iter_frames()), so
+    only one frame is held in memory.
+
+    # Arguments
+        input_file: file name of trajectory (.lammpstrj or .xyz)
+        store_dir: output directory, created if it doesn't exist
+
+    # Return
+        TrajectoryStore of store_dir
+
+    # Example
+        store = convert_trajectory('dump.lammpstrj', 'dump_store')
+        table, info = store.frame(10000)
+
+    # Date
+        20261018
+    """
+    index = io_utils.load_frame_index(input_file)
+    num_frame = len(index['offset'])
+    frame_start = np.concatenate([[0], np.cumsum(index['num_atom'])])
+    total = int(frame_start[-1])
+    os.makedirs(store_dir, exist_ok=True)
+
+    def open_column(name, dtype, shape):
+        return np.lib.format.open_memmap(
+            os.path.join(store_dir, name + '.npy'), mode='w+', dtype=dtype,
+            shape=shape)
+
+    atom_id = open_column('atom_id', np.int64, (total,))
+    type_code = open_column('type_code', np.uint8, (total,))
+    pos = open_column('pos', np.float64, (3, total))
+    extra = {}
+    names = None
+    species = []
+    bounds = []
+    box_list = []
+    for indx, (table, info) in enumerate(io_utils.iter_frames(input_file)):
+        start = frame_start[indx]
+        end = frame_start[indx + 1]
+        if len(table) != end - start:
+            raise ValueError('frame {} of {} has {} atoms, index has '
+                             '{}'.format(indx, input_file, len(table),
+                                         end - start))
+
+        # same columns in all frames
+        if names is None:
+            names = list(info['columns'])
+            for name in names:
+                if name not in ('id', 'type', 'element', 'x', 'y', 'z'):
+                    extra[name] = open_column(name, np.float64, (total,))
+        elif list(info['columns']) != names:
+            raise ValueError('columns of frame {} {} are not {}'.format(
+                indx, list(info['columns']), names))
+
+        # species of all frames
+        for name in table.species:
+            if name not in species:
+                species.append(name)
+        remap = np.array([species.index(name) for name in table.species],
+                         dtype=np.uint8)
+
+        atom_id[start:end] = table.atom_id
+        type_code[start:end] = remap[table.type_code] if len(remap) else \
+            table.type_code
+        pos[:, start:end] = table.pos
+        for name, column in extra.items():
+            column[start:end] = info['columns'][name]
+        bounds.append(info['bounds'])
+        box_list.append(info['box'] if info['box'] is not None else [])
+
+    # frames of a triclinic box have 9 values
+    num_box = max([len(box) for box in box_list] + [0])
+    box = np.full((num_frame, num_box), np.nan)
+    for indx, each in enumerate(box_list):
+        box[indx, :len(each)] = each
+
+    np.save(os.path.join(store_dir, 'frame_start.npy'), frame_start)
+    np.save(os.path.join(store_dir, 'timestep.npy'), index['timestep'])
+    np.save(os.path.join(store_dir, 'box.npy'), box)
+    for column in [atom_id, type_code, pos] + list(extra.values()):
+        column.flush()
+    del atom_id, type_code, pos, extra
+
+    stat = os.stat(input_file)
+    manifest = {'version': STORE_VERSION,
+                'source': os.path.realpath(input_file),
+                'source_size': stat.st_size,
+                'source_mtime_ns': stat.st_mtime_ns,
+                'num_frame': num_frame,
+                'num_atom': total,
+                'columns': names if names is not None else [],
+                'species': species,
+                'bounds': bounds}
+    # written last, a directory without manifest is incomplete
+    with open(os.path.join(store_dir, MANIFEST), 'w') as fout:
+        json.dump(manifest, fout, indent=1)
+
+    return TrajectoryStore(store_dir)
+
+
+class TrajectoryStore:
+    """Frames of a directory written by convert_trajectory().
+
+    Columns are opened with np.load(mmap_mode='r'), so a frame is a slice
+    of memory-mapped columns: reading frame 10000 doesn't read or copy
+    frames before it, and only pages that are used are read from disk.
+
+    # Argument
+        store_dir: directory written by convert_trajectory()
+
+    # Example
+        store = TrajectoryStore('dump_store')
+        for indx in range(len(store)):
+            table, info = store.frame(indx)
+            vx = store.column('vx', indx)
+
+    # Date
+        20261018
+    """
+
+    def __init__(self, store_dir):
+
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST)) as fin:
+            self.manifest = json.load(fin)
+        if self.manifest['version'] != STORE_VERSION:
+            raise ValueError('version {} of {} is not {}'.format(
+                self.manifest['version'], store_dir, STORE_VERSION))
+        self.species = self.manifest['species']
+        self.frame_start = self.load('frame_start')
+        self.timestep = self.load('timestep')
+        self.box = self.load('box')
+        self.atom_id = self.load('atom_id')
+        self.type_code = self.load('type_code')
+        self.pos = self.load('pos')
+
+    def load(self, name):
+        """Memory-mapped column of all frames."""
+        return np.load(os.path.join(self.store_dir, name + '.npy'),
+                       mmap_mode='r')
+
+    def __len__(self):
+        return self.manifest['num_frame']
+
+    def frame_slice(self, frame):
+        """Slice of atoms of a frame in columns."""
+        frame = range(len(self))[frame]
+        return slice(int(self.frame_start[frame]),
+                     int(self.frame_start[frame + 1]))
+
+    def column(self, name, frame):
+        """Memory-mapped view of a column (ex: 'vx') of a frame."""
+        return self.load(name)[self.frame_slice(frame)]
+
+    def frame(self, frame):
+        """AtomTable of a frame, its columns are memory-mapped views.
+
+        # Arguments
+            frame: index of frame (negative counts from the last frame)
+
+        # Return
+            AtomTable (atom_utils) and dictionary of 'timestep', 'box' and
+            'bounds'
+        """
+        frame = range(len(self))[frame]
+        atoms = self.frame_slice(frame)
+        table = atom_utils.AtomTable.from_pos(self.atom_id[atoms],
+                                              self.type_code[atoms],
+                                              self.pos[:, atoms],
+                                              self.species)
+        box = self.box[frame]
+        info = {'timestep': int(self.timestep[frame]),
+                'box': [float(v) for v in box[~np.isnan(box)]] or None,
+                'bounds': self.manifest['bounds'][frame]}
+        return table, info